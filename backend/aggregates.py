@@ -0,0 +1,225 @@
+"""
+任务汇总统计
+评估项评分变化时按新旧评分的差值更新 AssessmentTask 上的汇总列，
+避免每次更新都重新扫描整个任务的评估项
+
+校验 / 修复命令（在 backend 目录下执行）:
+    python aggregates.py          # 仅校验，输出不一致的任务
+    python aggregates.py --fix    # 从评估项重新计算并写回
+"""
+from datetime import datetime
+import argparse
+import sys
+
+from sqlalchemy import Numeric, case, cast, func, update
+from sqlalchemy.orm import Session
+
+from models import AssessmentTask, AssessmentItem, SessionLocal
+from scoring import ScoringModel
+
+# 评分 -> 计数列
+RATING_COUNT_COLUMNS = {
+    "compliant": "compliant_count",
+    "partial": "partial_count",
+    "non_compliant": "non_compliant_count",
+    "not_applicable": "not_applicable_count",
+}
+
+AGGREGATE_COLUMNS = ["total_score", "item_count", "applicable_count"] + list(RATING_COUNT_COLUMNS.values())
+
+REPAIR_BATCH_SIZE = 500  # 校验 / 修复时每个事务处理的任务数
+
+
+def rating_delta(old_rating, old_score, new_rating, new_score, delta=None):
+    """计算单个评估项评分变化带来的汇总增量，可累加到已有的 delta 上"""
+    if delta is None:
+        delta = {}
+    for rating, score, sign in ((old_rating, old_score, -1), (new_rating, new_score, 1)):
+        delta["total_score"] = delta.get("total_score", 0.0) + sign * (score or 0.0)
+        column = RATING_COUNT_COLUMNS.get(rating)
+        if column:
+            delta[column] = delta.get(column, 0) + sign
+        if rating == "not_applicable":
+            delta["applicable_count"] = delta.get("applicable_count", 0) - sign
+    return delta
+
+
+def lock_task(db: Session, task_id: int):
+    """在当前事务内递增任务版本号（不提交），返回新的版本号，任务不存在时返回 None
+
+    该 UPDATE 同时锁定任务直到事务结束（PostgreSQL 行锁，SQLite 数据库写锁），
+    写评估项前先调用，之后读到的评估项旧值不会被并发的更新修改，按旧值计算的增量才准确
+    """
+    return db.execute(
+        update(AssessmentTask).where(AssessmentTask.id == task_id)
+        .values(version=AssessmentTask.version + 1, updated_at=datetime.now())
+        .returning(AssessmentTask.version)
+    ).scalar()
+
+
+def lock_tasks(db: Session, task_ids):
+    """在当前事务内锁定一批任务（不修改数据、不递增版本号），锁的范围同 lock_task
+
+    从评估项重新计算汇总前调用，写回之前并发的评估项更新需等待，不会被按旧数据计算的结果覆盖
+    """
+    db.execute(
+        update(AssessmentTask).where(AssessmentTask.id.in_(task_ids))
+        .values(version=AssessmentTask.version)
+    )
+
+
+def apply_task_delta(db: Session, task_id: int, delta: dict):
+    """在当前事务内把增量写入任务汇总列（不提交），需先通过 lock_task 锁定任务"""
+    columns = AssessmentTask.__table__.c
+    values = {name: columns[name] + amount for name, amount in delta.items() if amount}
+
+    # 合规率基于更新后的计数在同一条 UPDATE 中计算，避免并发更新时读到旧值
+    compliant = columns.compliant_count + delta.get("compliant_count", 0)
+    applicable = columns.applicable_count + delta.get("applicable_count", 0)
+    # PostgreSQL 的 round(x, n) 只接受 numeric
+    values["compliance_rate"] = case(
+        (applicable > 0, func.round(cast(compliant * 100.0 / applicable, Numeric), 2)),
+        else_=0.0,
+    )
+    db.execute(update(AssessmentTask).where(AssessmentTask.id == task_id).values(**values))
+
+
+def _empty_aggregates():
+    return {name: 0 for name in AGGREGATE_COLUMNS} | {"total_score": 0.0}
+
+
+def _add_rating_group(agg: dict, rating, count: int, score_sum):
+    agg["item_count"] += count
+    agg["total_score"] += score_sum or 0.0
+    column = RATING_COUNT_COLUMNS.get(rating)
+    if column:
+        agg[column] += count
+    if rating != "not_applicable":
+        agg["applicable_count"] += count
+
+
+def _finish(agg: dict):
+    applicable = agg["applicable_count"]
+    agg["compliance_rate"] = round(agg["compliant_count"] / applicable * 100, 2) if applicable else 0
+    return agg
+
+
+def aggregate_items(items):
+    """从 (评分, 得分) 序列计算任务汇总"""
+    agg = _empty_aggregates()
+    for rating, score in items:
+        _add_rating_group(agg, rating, 1, score)
+    return _finish(agg)
+
+
+def _rating_groups(db: Session, task_ids):
+    return db.query(
+        AssessmentItem.task_id,
+        AssessmentItem.rating,
+        func.count(AssessmentItem.id),
+        func.sum(AssessmentItem.score),
+    ).filter(AssessmentItem.task_id.in_(task_ids)).group_by(AssessmentItem.task_id, AssessmentItem.rating).all()
+
+
+def compute_task_result(db: Session, task: AssessmentTask, template=None):
+    """计算任务评估结果（总分、维度得分、加权总分、评分分布），template 为缓存模板"""
+    rows = db.query(
+        AssessmentItem.template_item_id,
+        AssessmentItem.dimension,
+        AssessmentItem.rating
+    ).filter(AssessmentItem.task_id == task.id).all()
+
+    model = template.scoring if template else ScoringModel.for_items((r[0], r[1]) for r in rows)
+    scores = model.score(model.encode((r[0], r[2]) for r in rows))
+
+    level_distribution = {"compliant": 0, "partial": 0, "non_compliant": 0, "not_applicable": 0}
+    completed_items = 0
+    for _, _, rating in rows:
+        if rating not in ("not_started", "not_applicable"):
+            completed_items += 1
+        if rating in level_distribution:
+            level_distribution[rating] += 1
+
+    return {
+        "task_id": task.id,
+        "total_items": len(rows),
+        "completed_items": completed_items,
+        "total_score": scores["total_score"],
+        "max_score": scores["max_score"],
+        "weighted_score": scores["weighted_score"],
+        "compliance_rate": task.compliance_rate,
+        "dimension_scores": {d["name"]: d["rate"] for d in scores["dimensions"]},
+        "dimension_details": scores["dimensions"],
+        "level_distribution": level_distribution
+    }
+
+
+def diff_aggregates(task, expected: dict):
+    """对比任务上存储的汇总值与重新计算的值"""
+    diff = {}
+    for name, value in expected.items():
+        stored = getattr(task, name)
+        if stored is None or abs(stored - value) > 1e-6:
+            diff[name] = (stored, value)
+    return diff
+
+
+def repair_all_aggregates(db: Session, fix: bool = True, batch_size: int = REPAIR_BATCH_SIZE, progress=None):
+    """校验所有任务的汇总列，返回 [(task_id, diff)]；fix 为 True 时写回正确值
+
+    任务按 ID 分批，每批一个事务：先锁定该批任务（lock_tasks）再读取评估项和汇总列，
+    可在服务运行时执行，并发的评估项更新不会被覆盖，也不会误报为不一致；
+    progress(已处理任务数, 总任务数) 在每批完成后调用
+    """
+    task_ids = [task_id for (task_id,) in db.query(AssessmentTask.id).order_by(AssessmentTask.id)]
+    mismatches = []
+    for start in range(0, len(task_ids), batch_size):
+        batch = task_ids[start:start + batch_size]
+        lock_tasks(db, batch)
+        computed = {}
+        for task_id, rating, count, score_sum in _rating_groups(db, batch):
+            _add_rating_group(computed.setdefault(task_id, _empty_aggregates()), rating, count, score_sum)
+
+        for task in db.query(AssessmentTask).filter(AssessmentTask.id.in_(batch)).order_by(AssessmentTask.id):
+            expected = _finish(computed.get(task.id, _empty_aggregates()))
+            diff = diff_aggregates(task, expected)
+            if diff:
+                mismatches.append((task.id, diff))
+                if fix:
+                    for name, value in expected.items():
+                        setattr(task, name, value)
+                    task.version = (task.version or 0) + 1
+        if fix:
+            db.commit()
+        else:
+            db.rollback()  # 释放锁
+        if progress:
+            progress(start + len(batch), len(task_ids))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验 / 修复任务汇总统计")
+    parser.add_argument("--fix", action="store_true", help="将重新计算的结果写回数据库")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        mismatches = repair_all_aggregates(db, fix=args.fix)
+    finally:
+        db.close()
+
+    for task_id, diff in mismatches:
+        fields = ", ".join(f"{name}: {old} -> {new}" for name, (old, new) in diff.items())
+        print(f"任务 {task_id}: {fields}")
+    if not mismatches:
+        print("✅ 所有任务汇总一致")
+    elif args.fix:
+        print(f"✅ 已修复 {len(mismatches)} 个任务")
+    else:
+        print(f"⚠️  {len(mismatches)} 个任务汇总不一致，使用 --fix 修复")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
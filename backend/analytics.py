@@ -0,0 +1,394 @@
+"""
+跨任务统计分析
+组织 / 模板维度的合规率直接基于 AssessmentTask 上的汇总列（见 aggregates.py）分组计算，
+维度趋势和控制项统计需要评估项粒度的数据，由两张汇总表增量维护：
+
+- dimension_rollups      按 (模板, 维度, 任务创建月份) 统计各评分数量、得分和已评估适用项的满分合计
+- control_item_rollups   按 (模板, 控制项) 统计各评分数量
+
+评估项评分变化、任务删除时在同一事务内按差值更新汇总表；统计接口只读汇总表和任务表，不扫描评估项
+全量重建 / 校验在锁定汇总表后计算（lock_rollups），期间的增量更新等待其完成
+
+校验 / 重建命令（在 backend 目录下执行）:
+    python analytics.py          # 仅校验，输出不一致的汇总行
+    python analytics.py --fix    # 从评估项重新生成汇总表
+"""
+import argparse
+import sys
+
+from sqlalchemy import case, delete, false, func, text
+from sqlalchemy.orm import Session
+
+from models import (
+    AssessmentTask, AssessmentItem, StandardTemplate, DimensionRollup, ControlItemRollup, SessionLocal
+)
+from aggregates import RATING_COUNT_COLUMNS
+from scoring import DEFAULT_MAX_SCORE
+from template_cache import get_cached_template
+
+RATED_COLUMNS = ["compliant_count", "partial_count", "non_compliant_count"]  # 已评估且适用
+RATED = ("compliant", "partial", "non_compliant")
+
+
+def task_period(created_at) -> str:
+    """任务所属统计周期（创建月份）"""
+    return created_at.strftime("%Y-%m")
+
+
+# ============ 增量维护 ============
+
+def item_max_score(template, template_item_id) -> float:
+    """评估项满分（模板不存在时为默认满分），与评估项得分的计算一致"""
+    return template.scoring.max_score_of(template_item_id) if template else DEFAULT_MAX_SCORE
+
+
+def rollup_delta(dimension, template_item_id, max_score, old_rating, old_score, new_rating, new_score, delta=None):
+    """计算单个评估项评分变化带来的汇总表增量，可累加到已有的 delta 上；max_score 为该评估项的满分"""
+    if delta is None:
+        delta = {"dimensions": {}, "items": {}}
+    dimension = dimension or ""
+    dim = delta["dimensions"].setdefault(dimension, {})
+    item = delta["items"].setdefault(template_item_id, {"dimension": dimension})
+    for rating, score, sign in ((old_rating, old_score, -1), (new_rating, new_score, 1)):
+        dim["score_sum"] = dim.get("score_sum", 0.0) + sign * (score or 0.0)
+        if rating in RATED:
+            dim["max_score_sum"] = dim.get("max_score_sum", 0.0) + sign * max_score
+        column = RATING_COUNT_COLUMNS.get(rating)
+        if column:
+            dim[column] = dim.get(column, 0) + sign
+            item[column] = item.get(column, 0) + sign
+    return delta
+
+
+def _upsert_increments(db: Session, model, key_columns, rows):
+    """按主键累加计数，行不存在时插入（INSERT ... ON CONFLICT DO UPDATE）"""
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    columns = model.__table__.c
+    counters = [name for name in rows[0] if name not in key_columns and name != "dimension"]
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={name: columns[name] + stmt.excluded[name] for name in counters}
+    )
+    db.execute(stmt, rows)
+
+
+def apply_rollup_delta(db: Session, task_id: int, delta: dict, task=None):
+    """在当前事务内把增量写入汇总表（不提交）；task 为任务或含 template_id / created_at 的查询行，省略时查询"""
+    if task is None:
+        task = db.query(AssessmentTask.template_id, AssessmentTask.created_at).filter(
+            AssessmentTask.id == task_id
+        ).first()
+    template_id, period = task.template_id, task_period(task.created_at)
+
+    dim_rows = []
+    for dimension, counts in delta["dimensions"].items():
+        if any(counts.values()):
+            dim_rows.append({
+                "template_id": template_id, "dimension": dimension, "period": period,
+                "score_sum": counts.get("score_sum", 0.0),
+                "max_score_sum": counts.get("max_score_sum", 0.0),
+                **{c: counts.get(c, 0) for c in RATING_COUNT_COLUMNS.values()},
+            })
+    item_rows = []
+    for template_item_id, counts in delta["items"].items():
+        if any(counts.get(c) for c in RATING_COUNT_COLUMNS.values()):
+            item_rows.append({
+                "template_id": template_id, "template_item_id": template_item_id,
+                "dimension": counts["dimension"],
+                **{c: counts.get(c, 0) for c in RATING_COUNT_COLUMNS.values()},
+            })
+    _upsert_increments(db, DimensionRollup, ["template_id", "dimension", "period"], dim_rows)
+    _upsert_increments(db, ControlItemRollup, ["template_id", "template_item_id"], item_rows)
+
+
+def remove_task_from_rollups(db: Session, task: AssessmentTask):
+    """删除任务前从汇总表中减去其评估项（不提交）"""
+    groups = db.query(
+        AssessmentItem.dimension,
+        AssessmentItem.template_item_id,
+        AssessmentItem.rating,
+        func.count(AssessmentItem.id),
+        func.sum(AssessmentItem.score)
+    ).filter(
+        AssessmentItem.task_id == task.id,
+        AssessmentItem.rating.in_(RATING_COUNT_COLUMNS)
+    ).group_by(AssessmentItem.dimension, AssessmentItem.template_item_id, AssessmentItem.rating).all()
+
+    template = get_cached_template(db, task.template_id) if groups else None
+    delta = {"dimensions": {}, "items": {}}
+    for dimension, template_item_id, rating, count, score_sum in groups:
+        column = RATING_COUNT_COLUMNS[rating]
+        dim = delta["dimensions"].setdefault(dimension or "", {})
+        dim[column] = dim.get(column, 0) - count
+        dim["score_sum"] = dim.get("score_sum", 0.0) - (score_sum or 0.0)
+        if rating in RATED:
+            dim["max_score_sum"] = dim.get("max_score_sum", 0.0) - count * item_max_score(template, template_item_id)
+        item = delta["items"].setdefault(template_item_id, {"dimension": dimension or ""})
+        item[column] = item.get(column, 0) - count
+    if groups:
+        apply_rollup_delta(db, task.id, delta, task)
+
+
+# ============ 全量重建 ============
+
+def _period_expr(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(AssessmentTask.created_at, "YYYY-MM")
+    return func.strftime("%Y-%m", AssessmentTask.created_at)
+
+
+def compute_rollups(db: Session):
+    """从评估项全量计算汇总表内容，返回 (维度汇总, 控制项汇总)，均以主键元组为键"""
+    period = _period_expr(db)
+    dims = {}
+    templates = {}
+    # 按评估项分组，满分合计需按模板中各评估项的 max_score 计算
+    for template_id, dimension, p, template_item_id, rating, count, score_sum in db.query(
+        AssessmentTask.template_id,
+        AssessmentItem.dimension,
+        period,
+        AssessmentItem.template_item_id,
+        AssessmentItem.rating,
+        func.count(AssessmentItem.id),
+        func.sum(AssessmentItem.score)
+    ).join(AssessmentTask, AssessmentTask.id == AssessmentItem.task_id).filter(
+        AssessmentItem.rating.in_(RATING_COUNT_COLUMNS)
+    ).group_by(
+        AssessmentTask.template_id, AssessmentItem.dimension, period,
+        AssessmentItem.template_item_id, AssessmentItem.rating
+    ):
+        row = dims.setdefault((template_id, dimension or "", p), _empty_counts(score_sum=0.0, max_score_sum=0.0))
+        row[RATING_COUNT_COLUMNS[rating]] += count
+        row["score_sum"] += score_sum or 0.0
+        if rating in RATED:
+            if template_id not in templates:
+                templates[template_id] = get_cached_template(db, template_id)
+            row["max_score_sum"] += count * item_max_score(templates[template_id], template_item_id)
+
+    items = {}
+    for template_id, template_item_id, dimension, rating, count in db.query(
+        AssessmentTask.template_id,
+        AssessmentItem.template_item_id,
+        func.max(AssessmentItem.dimension),
+        AssessmentItem.rating,
+        func.count(AssessmentItem.id)
+    ).join(AssessmentTask, AssessmentTask.id == AssessmentItem.task_id).filter(
+        AssessmentItem.rating.in_(RATING_COUNT_COLUMNS)
+    ).group_by(AssessmentTask.template_id, AssessmentItem.template_item_id, AssessmentItem.rating):
+        row = items.setdefault((template_id, template_item_id), _empty_counts(dimension=dimension or ""))
+        row[RATING_COUNT_COLUMNS[rating]] += count
+    return dims, items
+
+
+def _empty_counts(**extra):
+    return {c: 0 for c in RATING_COUNT_COLUMNS.values()} | extra
+
+
+def _stored_rollups(db: Session):
+    dims = {
+        (r.template_id, r.dimension, r.period): r for r in db.query(DimensionRollup)
+    }
+    items = {
+        (r.template_id, r.template_item_id): r for r in db.query(ControlItemRollup)
+    }
+    return dims, items
+
+
+def _diff_rows(stored: dict, expected: dict, columns):
+    """对比存储的汇总行与重新计算的值，计数全为 0 的行视为不存在"""
+    diffs = []
+    for key in stored.keys() | expected.keys():
+        row = stored.get(key)
+        values = expected.get(key, {})
+        for name in columns:
+            old = getattr(row, name) if row is not None else 0
+            new = values.get(name, 0)
+            if abs((old or 0) - new) > 1e-6:
+                diffs.append((key, name, old, new))
+    return diffs
+
+
+def lock_rollups(db: Session):
+    """锁定汇总表直到事务结束（PostgreSQL 表锁，SQLite 数据库写锁）
+
+    全量计算之前调用：计算期间并发的增量更新（apply_rollup_delta）需等待本事务结束，
+    不会出现增量已提交、却被按旧数据计算的结果覆盖（或校验时误报不一致）的情况
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE dimension_rollups, control_item_rollups IN EXCLUSIVE MODE"))
+    else:
+        db.execute(delete(DimensionRollup).where(false()))  # 写语句取得数据库写锁
+
+
+def check_rollups(db: Session):
+    """校验汇总表，返回 [(主键, 列名, 存储值, 正确值)]"""
+    lock_rollups(db)
+    try:
+        dims, items = compute_rollups(db)
+        stored_dims, stored_items = _stored_rollups(db)
+        counts = list(RATING_COUNT_COLUMNS.values())
+        return (_diff_rows(stored_dims, dims, counts + ["score_sum", "max_score_sum"])
+                + _diff_rows(stored_items, items, counts))
+    finally:
+        db.rollback()  # 释放锁
+
+
+def rebuild_rollups(db: Session):
+    """从评估项重新生成汇总表（单个事务），返回 (维度汇总行数, 控制项汇总行数)"""
+    lock_rollups(db)
+    dims, items = compute_rollups(db)
+    db.query(DimensionRollup).delete()
+    db.query(ControlItemRollup).delete()
+    if dims:
+        db.bulk_insert_mappings(DimensionRollup, [
+            {"template_id": t, "dimension": d, "period": p, **values} for (t, d, p), values in dims.items()
+        ])
+    if items:
+        db.bulk_insert_mappings(ControlItemRollup, [
+            {"template_id": t, "template_item_id": i, **values} for (t, i), values in items.items()
+        ])
+    db.commit()
+    return len(dims), len(items)
+
+
+# ============ 统计查询 ============
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator * 100, 2) if denominator else 0
+
+
+def _task_summary_columns():
+    return [
+        func.count(AssessmentTask.id).label("task_count"),
+        func.sum(case((AssessmentTask.status == "completed", 1), else_=0)).label("completed_tasks"),
+        func.avg(AssessmentTask.compliance_rate).label("avg_compliance_rate"),
+        func.sum(AssessmentTask.compliant_count).label("compliant_count"),
+        func.sum(AssessmentTask.applicable_count).label("applicable_count"),
+    ]
+
+
+def _task_summary(row):
+    return {
+        "task_count": row.task_count,
+        "completed_tasks": int(row.completed_tasks or 0),
+        # 各任务合规率的平均值
+        "avg_compliance_rate": round(float(row.avg_compliance_rate or 0), 2),
+        # 所有任务评估项合计的合规率
+        "overall_compliance_rate": _rate(row.compliant_count or 0, row.applicable_count or 0),
+    }
+
+
+def template_analytics(db: Session):
+    """各模板的任务数和平均合规率"""
+    names = dict(db.query(StandardTemplate.id, StandardTemplate.name))
+    rows = db.query(AssessmentTask.template_id, *_task_summary_columns()).group_by(
+        AssessmentTask.template_id
+    ).order_by(AssessmentTask.template_id).all()
+    return [
+        {"template_id": r.template_id, "template_name": names.get(r.template_id, r.template_id), **_task_summary(r)}
+        for r in rows
+    ]
+
+
+def organization_analytics(db: Session, template_id: str = None):
+    """各被评估组织的任务数和平均合规率"""
+    query = db.query(AssessmentTask.organization, *_task_summary_columns())
+    if template_id:
+        query = query.filter(AssessmentTask.template_id == template_id)
+    rows = query.group_by(AssessmentTask.organization).order_by(AssessmentTask.organization).all()
+    return [{"organization": r.organization, **_task_summary(r)} for r in rows]
+
+
+def dimension_analytics(db: Session, template_id: str, since: str = None):
+    """模板各维度按月的合规率和得分率（仅统计已评估且适用的评估项）"""
+    query = db.query(DimensionRollup).filter(DimensionRollup.template_id == template_id)
+    if since:
+        query = query.filter(DimensionRollup.period >= since)
+    template = get_cached_template(db, template_id)
+    info = template.dimension_info if template else {}
+
+    result = []
+    for r in query.order_by(DimensionRollup.dimension, DimensionRollup.period):
+        rated = sum(getattr(r, c) for c in RATED_COLUMNS)
+        if not rated and not r.not_applicable_count:
+            continue
+        result.append({
+            "dimension": r.dimension,
+            "dimension_name": info.get(r.dimension, {}).get("name", r.dimension),
+            "period": r.period,
+            "rated_count": rated,
+            "compliant_count": r.compliant_count,
+            "partial_count": r.partial_count,
+            "non_compliant_count": r.non_compliant_count,
+            "not_applicable_count": r.not_applicable_count,
+            "compliance_rate": _rate(r.compliant_count, rated),
+            "score_rate": _rate(r.score_sum, r.max_score_sum or 0),
+        })
+    return result
+
+
+def control_item_analytics(db: Session, template_id: str = None, limit: int = 20):
+    """不符合次数最多的控制项"""
+    query = db.query(ControlItemRollup).filter(ControlItemRollup.non_compliant_count > 0)
+    if template_id:
+        query = query.filter(ControlItemRollup.template_id == template_id)
+    rows = query.order_by(
+        ControlItemRollup.non_compliant_count.desc(),
+        ControlItemRollup.template_id,
+        ControlItemRollup.template_item_id
+    ).limit(limit).all()
+
+    templates = {}
+    result = []
+    for r in rows:
+        if r.template_id not in templates:
+            templates[r.template_id] = get_cached_template(db, r.template_id)
+        template = templates[r.template_id]
+        item = template.items_by_id.get(r.template_item_id, {}) if template else {}
+        rated = sum(getattr(r, c) for c in RATED_COLUMNS)
+        result.append({
+            "template_id": r.template_id,
+            "template_item_id": r.template_item_id,
+            "dimension": r.dimension,
+            "content": item.get("content", ""),
+            "level": item.get("level", ""),
+            "rated_count": rated,
+            "non_compliant_count": r.non_compliant_count,
+            "partial_count": r.partial_count,
+            "non_compliant_rate": _rate(r.non_compliant_count, rated),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校验 / 重建统计汇总表")
+    parser.add_argument("--fix", action="store_true", help="从评估项重新生成汇总表")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.fix:
+            dims, items = rebuild_rollups(db)
+            print(f"✅ 已重建汇总表：维度 {dims} 行，控制项 {items} 行")
+            return
+        diffs = check_rollups(db)
+    finally:
+        db.close()
+
+    for key, name, old, new in diffs[:50]:
+        print(f"{'/'.join(key)} {name}: {old} -> {new}")
+    if not diffs:
+        print("✅ 汇总表一致")
+    else:
+        print(f"⚠️  {len(diffs)} 处不一致，使用 --fix 重建")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+数据库引擎配置
+SQLite 连接参数（WAL、同步级别、页缓存、忙等待）通过连接事件设置，连接池参数由环境变量控制；
+异步引擎（供异步接口使用）与同步引擎连接同一数据库，驱动为 aiosqlite / asyncpg
+
+环境变量:
+    DB_SQLITE_JOURNAL_MODE     日志模式，默认 WAL
+    DB_SQLITE_SYNCHRONOUS      同步级别，默认 NORMAL（WAL 模式下安全且写入更快）
+    DB_SQLITE_CACHE_SIZE_KB    每个连接的页缓存大小（KB），默认 65536
+    DB_SQLITE_BUSY_TIMEOUT_MS  遇到写锁时的等待时间（毫秒），默认 5000
+    DB_POOL_SIZE               连接池大小，默认 5
+    DB_MAX_OVERFLOW            连接池溢出上限，默认 10
+    DB_POOL_TIMEOUT            获取连接超时（秒），默认 30
+    DB_POOL_RECYCLE            连接回收周期（秒），默认 -1（不回收）
+    ASYNC_DATABASE_URL         异步引擎连接地址，默认由 DATABASE_URL 换用异步驱动得到
+"""
+import os
+
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+# 同步连接地址的数据库类型 -> 异步驱动
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value not in (None, "") else default
+
+
+def sqlite_pragmas_from_env():
+    """从环境变量读取 SQLite PRAGMA 设置"""
+    return {
+        "journal_mode": os.environ.get("DB_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "cache_size": -_env_int("DB_SQLITE_CACHE_SIZE_KB", 65536),  # 负数表示 KB
+        "busy_timeout": _env_int("DB_SQLITE_BUSY_TIMEOUT_MS", 5000),
+    }
+
+
+def pool_options_from_env():
+    """从环境变量读取连接池参数"""
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", -1),
+    }
+
+
+def _pool_options(url: str, pool_options: dict = None) -> dict:
+    in_memory = url.endswith(":memory:") or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:", "sqlite+aiosqlite:")
+    if url.startswith("sqlite") and in_memory:
+        return {}  # 内存数据库使用单连接池，不支持连接池参数
+    return pool_options_from_env() if pool_options is None else pool_options
+
+
+def _install_sqlite_pragmas(engine: Engine, sqlite_pragmas: dict = None):
+    pragmas = sqlite_pragmas_from_env() if sqlite_pragmas is None else sqlite_pragmas
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value is not None:
+                cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str, sqlite_pragmas: dict = None, pool_options: dict = None) -> Engine:
+    """创建数据库引擎，未指定的参数取环境变量配置"""
+    is_sqlite = url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if is_sqlite else {}
+    engine = create_engine(url, connect_args=connect_args, **_pool_options(url, pool_options))
+    if is_sqlite:
+        _install_sqlite_pragmas(engine, sqlite_pragmas)
+    return engine
+
+
+def async_database_url(url: str) -> str:
+    """同步连接地址换用异步驱动（sqlite -> aiosqlite，postgresql -> asyncpg）"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"不支持的数据库类型：{parsed.get_backend_name()}，请通过 ASYNC_DATABASE_URL 指定异步连接地址")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def create_async_db_engine(url: str, sqlite_pragmas: dict = None, pool_options: dict = None) -> AsyncEngine:
+    """创建异步数据库引擎，连接参数与 create_db_engine 相同"""
+    engine = create_async_engine(url, **_pool_options(url, pool_options))
+    if url.startswith("sqlite"):
+        _install_sqlite_pragmas(engine.sync_engine, sqlite_pragmas)
+    return engine
@@ -0,0 +1,312 @@
+"""
+评估报告导出
+生成包含评估项、评分、证据、维度得分和薄弱环节的 Excel / PDF 报告
+
+内存占用控制：
+- 评估项按批次从数据库读取，Excel 使用 openpyxl 只写模式逐行写出
+- 报告先写入临时文件，再分块发送给客户端
+- 批量导出时逐个任务生成报告并写入流式 ZIP，同一时刻只有一个任务的报告在生成，
+  内存占用与任务数量无关
+"""
+import os
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from sqlalchemy.orm import Session
+
+from models import AssessmentTask, AssessmentItem, SessionLocal
+from aggregates import compute_task_result
+from template_cache import get_cached_template
+from templates import RATING_LABELS
+
+# 格式 -> (Content-Type, 扩展名)
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "pdf": ("application/pdf", ".pdf"),
+}
+
+CHUNK_SIZE = 64 * 1024
+ITEM_BATCH_SIZE = 500
+EXPORT_MAX_TASKS = int(os.environ.get("EXPORT_MAX_TASKS") or 500)  # 单次批量导出的任务数上限
+WEAK_DIMENSION_THRESHOLD = 60  # 维度得分低于该值视为薄弱维度
+WEAK_RATINGS = ("non_compliant", "partial")  # 不符合 / 部分符合的评估项列为薄弱环节
+
+STATUS_LABELS = {"draft": "草稿", "in_progress": "进行中", "completed": "已完成"}
+
+ITEM_COLUMNS = ["编号", "维度", "控制项", "级别", "评估结果", "得分", "证据", "备注"]
+
+
+def load_report(db: Session, task_id: int):
+    """加载报告概要数据，任务不存在时返回 None"""
+    task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+    if not task:
+        return None
+    template = get_cached_template(db, task.template_id)
+    result = compute_task_result(db, task, template)
+    weak_dimensions = [
+        (name, score) for name, score in result["dimension_scores"].items()
+        if score < WEAK_DIMENSION_THRESHOLD
+    ]
+    return {
+        "task": task,
+        "template": template,
+        "result": result,
+        "dimension_names": {k: v["name"] for k, v in template.dimension_info.items()} if template else {},
+        "weak_dimensions": weak_dimensions,
+    }
+
+
+def iter_item_rows(db: Session, report: dict, weak_only: bool = False):
+    """按批次读取评估项，逐行生成报告表格数据"""
+    query = db.query(
+        AssessmentItem.template_item_id,
+        AssessmentItem.dimension,
+        AssessmentItem.control_item,
+        AssessmentItem.level,
+        AssessmentItem.rating,
+        AssessmentItem.score,
+        AssessmentItem.evidence,
+        AssessmentItem.remarks,
+    ).filter(AssessmentItem.task_id == report["task"].id)
+    if weak_only:
+        query = query.filter(AssessmentItem.rating.in_(WEAK_RATINGS))
+    names = report["dimension_names"]
+    for row in query.order_by(AssessmentItem.id).yield_per(ITEM_BATCH_SIZE):
+        yield [
+            row.template_item_id,
+            names.get(row.dimension, row.dimension),
+            row.control_item or "",
+            row.level or "",
+            RATING_LABELS.get(row.rating, "未评估"),
+            row.score or 0,
+            row.evidence or "",
+            row.remarks or "",
+        ]
+
+
+def overview_rows(report: dict):
+    task, result = report["task"], report["result"]
+    template = report["template"]
+    return [
+        ("任务名称", task.name),
+        ("被评估组织", task.organization or ""),
+        ("评估标准", f"{template.name} ({template.standard_no})" if template else task.template_id),
+        ("状态", STATUS_LABELS.get(task.status, task.status)),
+        ("评估项数", result["total_items"]),
+        ("已完成", result["completed_items"]),
+        ("总得分", f"{result['total_score']:g} / {result['max_score']:g}"),
+        ("加权得分", f"{result['weighted_score']}"),
+        ("合规率", f"{result['compliance_rate']}%"),
+        ("创建时间", task.created_at.strftime("%Y-%m-%d %H:%M")),
+        ("更新时间", task.updated_at.strftime("%Y-%m-%d %H:%M")),
+    ]
+
+
+# ============ Excel ============
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def write_xlsx(db: Session, report: dict, path: str):
+    """生成 Excel 报告（只写模式，逐行写出）"""
+    wb = Workbook(write_only=True)
+
+    ws = wb.create_sheet("概览")
+    for row in overview_rows(report):
+        ws.append([_xlsx_value(v) for v in row])
+
+    ws = wb.create_sheet("维度得分")
+    ws.append(["维度", "得分率 (%)"])
+    for name, score in report["result"]["dimension_scores"].items():
+        ws.append([name, score])
+    ws.append([])
+    ws.append(["评分", "数量"])
+    for rating, count in report["result"]["level_distribution"].items():
+        ws.append([RATING_LABELS.get(rating, rating), count])
+
+    ws = wb.create_sheet("薄弱环节")
+    ws.append([f"得分率低于 {WEAK_DIMENSION_THRESHOLD}% 的维度"])
+    for name, score in report["weak_dimensions"]:
+        ws.append([name, score])
+    ws.append([])
+    ws.append(ITEM_COLUMNS)
+    for row in iter_item_rows(db, report, weak_only=True):
+        ws.append([_xlsx_value(v) for v in row])
+
+    ws = wb.create_sheet("评估项明细")
+    ws.append(ITEM_COLUMNS)
+    for row in iter_item_rows(db, report):
+        ws.append([_xlsx_value(v) for v in row])
+
+    wb.save(path)
+
+
+# ============ PDF ============
+
+PDF_FONT = "STSong-Light"
+_font_registered = False
+
+
+def _styles():
+    global _font_registered
+    if not _font_registered:
+        pdfmetrics.registerFont(UnicodeCIDFont(PDF_FONT))
+        _font_registered = True
+    return {
+        "title": ParagraphStyle("title", fontName=PDF_FONT, fontSize=16, leading=22, spaceAfter=6),
+        "heading": ParagraphStyle("heading", fontName=PDF_FONT, fontSize=12, leading=18, spaceBefore=8, spaceAfter=4),
+        "cell": ParagraphStyle("cell", fontName=PDF_FONT, fontSize=8, leading=11),
+    }
+
+
+def _table(rows, col_widths, styles, header=True):
+    data = [[Paragraph(escape(str(v)), styles["cell"]) for v in row] for row in rows]
+    table = Table(data, colWidths=col_widths, repeatRows=1 if header else 0)
+    commands = [
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]
+    if header:
+        commands.append(("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8eaf6")))
+    table.setStyle(TableStyle(commands))
+    return table
+
+
+def write_pdf(db: Session, report: dict, path: str):
+    """生成 PDF 报告"""
+    styles = _styles()
+    page = landscape(A4)
+    doc = SimpleDocTemplate(path, pagesize=page, leftMargin=12 * mm, rightMargin=12 * mm,
+                            topMargin=12 * mm, bottomMargin=12 * mm, title=report["task"].name)
+    width = page[0] - 24 * mm
+    item_widths = [w * width for w in (0.1, 0.09, 0.25, 0.05, 0.07, 0.05, 0.25, 0.14)]
+
+    story = [Paragraph(escape(f"评估报告：{report['task'].name}"), styles["title"])]
+    story.append(_table(overview_rows(report), [0.2 * width, 0.8 * width], styles, header=False))
+
+    story.append(Paragraph("维度得分", styles["heading"]))
+    dim_rows = [["维度", "得分率 (%)"]] + list(report["result"]["dimension_scores"].items())
+    story.append(_table(dim_rows, [0.5 * width, 0.5 * width], styles))
+
+    story.append(Paragraph("薄弱环节", styles["heading"]))
+    if report["weak_dimensions"]:
+        text = "、".join(f"{name}（{score}%）" for name, score in report["weak_dimensions"])
+        story.append(Paragraph(escape(f"得分率低于 {WEAK_DIMENSION_THRESHOLD}% 的维度：{text}"), styles["cell"]))
+        story.append(Spacer(1, 4))
+    weak_rows = list(iter_item_rows(db, report, weak_only=True))
+    if weak_rows:
+        story.append(_table([ITEM_COLUMNS] + weak_rows, item_widths, styles))
+    else:
+        story.append(Paragraph("无不符合或部分符合的评估项", styles["cell"]))
+
+    story.append(Paragraph("评估项明细", styles["heading"]))
+    story.append(_table([ITEM_COLUMNS] + list(iter_item_rows(db, report)), item_widths, styles))
+
+    doc.build(story)
+
+
+WRITERS = {"xlsx": write_xlsx, "pdf": write_pdf}
+
+
+# ============ 流式输出 ============
+
+def render_report(db: Session, report: dict, fmt: str) -> str:
+    """生成报告到临时文件，返回文件路径（调用方负责删除）"""
+    fd, path = tempfile.mkstemp(suffix=EXPORT_FORMATS[fmt][1])
+    os.close(fd)
+    try:
+        WRITERS[fmt](db, report, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def report_filename(task: AssessmentTask, fmt: str) -> str:
+    name = "".join(c for c in task.name if c not in '\\/:*?"<>|').strip() or "report"
+    return f"{task.id}-{name}{EXPORT_FORMATS[fmt][1]}"
+
+
+def iter_file(path: str):
+    """分块读取文件并在读取完成后删除"""
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+    finally:
+        os.remove(path)
+
+
+def stream_task_report(task_id: int, fmt: str):
+    """单个任务报告的分块输出（同步生成器，由 StreamingResponse 在线程池中迭代）"""
+    db = SessionLocal()
+    try:
+        report = load_report(db, task_id)
+        path = render_report(db, report, fmt)
+    finally:
+        db.close()
+    yield from iter_file(path)
+
+
+class _StreamBuffer:
+    """只追加的缓冲区，供 zipfile 以流模式写入（无 seek，使用数据描述符）"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_reports_zip(task_ids, fmt: str):
+    """多个任务报告打包为 ZIP 的分块输出，逐个生成、写入后立即删除临时文件"""
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for task_id in task_ids:
+            db = SessionLocal()
+            try:
+                report = load_report(db, task_id)
+                if report is None:
+                    continue
+                path = render_report(db, report, fmt)
+                arcname = report_filename(report["task"], fmt)
+            finally:
+                db.close()
+
+            with zf.open(arcname, "w", force_zip64=True) as entry:
+                for chunk in iter_file(path):
+                    entry.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+    # 关闭 ZIP 时写入的剩余数据和中央目录
+    data = buffer.drain()
+    if data:
+        yield data
@@ -0,0 +1,389 @@
+"""
+后台任务
+耗时操作（批量导出、重新计算汇总、重新评分、重建统计汇总表、重新导入模板）提交为后台任务，在进程内线程池中执行，
+任务状态持久化在 jobs 表中，客户端通过接口轮询进度、获取结果或取消任务
+
+- 每种任务类型有独立的并发上限，超出上限的任务排队等待
+- 取消为协作式：排队中的任务直接取消，运行中的任务在下一个检查点退出
+- 多个 worker 进程各自执行提交到本进程的任务，状态和取消标记通过数据库共享
+
+环境变量:
+    JOB_MAX_WORKERS    后台线程数，默认 4
+    JOB_OUTPUT_DIR     任务结果文件目录，默认 data/jobs
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+
+from sqlalchemy.orm import Session
+
+from models import Job, SessionLocal
+from metrics import track_job
+
+MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS") or 4)
+OUTPUT_DIR = os.environ.get("JOB_OUTPUT_DIR") or os.path.join(os.path.dirname(__file__), '..', 'data', 'jobs')
+CANCEL_CHECK_INTERVAL = 1.0  # 运行中任务检查数据库取消标记的最小间隔（秒）
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+class JobValidationError(ValueError):
+    """任务参数无效"""
+
+
+# 任务类型 -> {"handler", "concurrency", "validate"}
+JOB_TYPES = {}
+
+
+def job_type(name: str, concurrency: int = 1, validate=None):
+    """注册任务类型；handler(ctx, params) 返回可 JSON 序列化的结果"""
+    def decorator(handler):
+        JOB_TYPES[name] = {"handler": handler, "concurrency": concurrency, "validate": validate}
+        return handler
+    return decorator
+
+
+class JobContext:
+    """传给任务处理函数的上下文"""
+
+    def __init__(self, runner: "JobRunner", job_id: str, params: dict):
+        self.runner = runner
+        self.job_id = job_id
+        self.params = params or {}
+        self.result_path = None
+        self._last_cancel_check = 0.0
+
+    def check_cancelled(self):
+        """检查点：任务被取消时抛出 JobCancelled"""
+        if self.job_id in self.runner._cancelled:
+            raise JobCancelled()
+        now = time.monotonic()
+        if now - self._last_cancel_check >= CANCEL_CHECK_INTERVAL:
+            self._last_cancel_check = now
+            db = SessionLocal()
+            try:
+                requested = db.query(Job.cancel_requested).filter(Job.id == self.job_id).scalar()
+            finally:
+                db.close()
+            if requested:
+                raise JobCancelled()
+
+    def set_progress(self, progress: float):
+        self.runner._update(self.job_id, progress=round(min(max(progress, 0.0), 1.0), 4))
+
+    def output_path(self, suffix: str) -> str:
+        """任务结果文件路径，任务成功后通过结果接口下载"""
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        self.result_path = os.path.join(OUTPUT_DIR, f"{self.job_id}{suffix}")
+        return self.result_path
+
+
+class JobRunner:
+    """进程内后台任务执行器"""
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = {}  # 任务类型 -> deque[任务 ID]
+        self._running = {}  # 任务类型 -> 运行中数量
+        self._cancelled = set()
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._recover()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, db: Session, type_name: str, params: dict) -> Job:
+        if type_name not in JOB_TYPES:
+            raise JobValidationError(f"未知的任务类型：{type_name}")
+        validate = JOB_TYPES[type_name]["validate"]
+        if validate:
+            validate(db, params or {})
+
+        job = Job(id=uuid.uuid4().hex, job_type=type_name, status="queued", params=params or {}, worker=WORKER_ID)
+        db.add(job)
+        db.commit()
+        self._enqueue(type_name, job.id)
+        return job
+
+    def cancel(self, db: Session, job: Job) -> Job:
+        """取消任务；已结束的任务不受影响"""
+        if job.status not in ("queued", "running"):
+            return job
+        with self._lock:
+            pending = self._pending.get(job.job_type)
+            if pending is not None and job.id in pending:
+                pending.remove(job.id)
+                job.status = "cancelled"
+                job.finished_at = datetime.now()
+            else:
+                self._cancelled.add(job.id)
+        job.cancel_requested = True
+        db.commit()
+        return job
+
+    def _enqueue(self, type_name: str, job_id: str):
+        with self._lock:
+            self._pending.setdefault(type_name, deque()).append(job_id)
+        self._dispatch(type_name)
+
+    def _dispatch(self, type_name: str):
+        """在并发上限内启动排队中的任务"""
+        limit = JOB_TYPES[type_name]["concurrency"]
+        with self._lock:
+            pending = self._pending.get(type_name)
+            while pending and self._running.get(type_name, 0) < limit and self._executor is not None:
+                job_id = pending.popleft()
+                self._running[type_name] = self._running.get(type_name, 0) + 1
+                self._executor.submit(self._run, type_name, job_id)
+
+    def _run(self, type_name: str, job_id: str):
+        try:
+            self._execute(type_name, job_id)
+        finally:
+            with self._lock:
+                self._running[type_name] -= 1
+                self._cancelled.discard(job_id)
+            self._dispatch(type_name)
+
+    def _execute(self, type_name: str, job_id: str):
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.id == job_id).first()
+            if job is None or job.status != "queued":
+                return
+            if job.cancel_requested:
+                job.status = "cancelled"
+                job.finished_at = datetime.now()
+                db.commit()
+                return
+            job.status = "running"
+            job.started_at = datetime.now()
+            job.worker = WORKER_ID
+            db.commit()
+            params = job.params
+        finally:
+            db.close()
+
+        ctx = JobContext(self, job_id, params)
+        with track_job(type_name) as outcome:
+            try:
+                result = JOB_TYPES[type_name]["handler"](ctx, ctx.params)
+            except JobCancelled:
+                outcome["status"] = "cancelled"
+                self._finish(job_id, "cancelled", ctx)
+            except Exception as e:
+                outcome["status"] = "failed"
+                traceback.print_exc()
+                self._finish(job_id, "failed", ctx, error=f"{type(e).__name__}: {e}")
+            else:
+                self._finish(job_id, "succeeded", ctx, result=result)
+
+    def _finish(self, job_id: str, status: str, ctx: JobContext, result=None, error=None):
+        values = {"status": status, "finished_at": datetime.now(), "result": result, "error": error}
+        if status == "succeeded":
+            values["progress"] = 1.0
+            values["result_path"] = ctx.result_path
+        elif ctx.result_path and os.path.exists(ctx.result_path):
+            os.remove(ctx.result_path)
+        self._update(job_id, **values)
+
+    def _update(self, job_id: str, **values):
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id == job_id).update(values)
+            db.commit()
+        finally:
+            db.close()
+
+    def _recover(self):
+        """处理上次运行时本机已退出进程遗留的任务：排队中的重新执行，运行中的标记为失败"""
+        host = socket.gethostname()
+        db = SessionLocal()
+        try:
+            stale = db.query(Job).filter(
+                Job.status.in_(("queued", "running")),
+                Job.worker.like(f"{host}:%")
+            ).all()
+            requeue = []
+            for job in stale:
+                if job.worker == WORKER_ID or _process_alive(int(job.worker.rsplit(":", 1)[1])):
+                    continue
+                if job.status == "running" or job.job_type not in JOB_TYPES:
+                    job.status = "failed"
+                    job.error = "服务重启，任务中断"
+                    job.finished_at = datetime.now()
+                else:
+                    job.worker = WORKER_ID
+                    requeue.append((job.job_type, job.id))
+            db.commit()
+        finally:
+            db.close()
+        for type_name, job_id in requeue:
+            self._enqueue(type_name, job_id)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def job_to_dict(job: Job):
+    return {
+        "id": job.id,
+        "type": job.job_type,
+        "status": job.status,
+        "params": job.params,
+        "progress": job.progress,
+        "result": job.result,
+        "has_file": bool(job.result_path),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+runner = JobRunner()
+
+
+# ============ 内置任务类型 ============
+
+def _validate_export(db: Session, params: dict):
+    from export import EXPORT_FORMATS, EXPORT_MAX_TASKS
+    task_ids = params.get("task_ids")
+    if not isinstance(task_ids, list) or not task_ids or not all(isinstance(i, int) for i in task_ids):
+        raise JobValidationError("task_ids 必须是非空的任务 ID 列表")
+    if len(task_ids) > EXPORT_MAX_TASKS:
+        raise JobValidationError(f"单次最多导出 {EXPORT_MAX_TASKS} 个任务")
+    if params.get("format", "xlsx") not in EXPORT_FORMATS:
+        raise JobValidationError(f"不支持的导出格式：{params.get('format')}")
+
+
+@job_type("export", concurrency=2, validate=_validate_export)
+def export_job(ctx: JobContext, params: dict):
+    """批量导出评估报告为 ZIP 文件"""
+    from export import load_report, render_report, report_filename
+    fmt = params.get("format", "xlsx")
+    task_ids = list(dict.fromkeys(params["task_ids"]))
+    path = ctx.output_path(".zip")
+    exported = 0
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for n, task_id in enumerate(task_ids, 1):
+            ctx.check_cancelled()
+            db = SessionLocal()
+            try:
+                report = load_report(db, task_id)
+                if report is None:
+                    continue
+                report_path = render_report(db, report, fmt)
+                arcname = report_filename(report["task"], fmt)
+            finally:
+                db.close()
+            try:
+                zf.write(report_path, arcname)
+            finally:
+                os.remove(report_path)
+            exported += 1
+            ctx.set_progress(n / len(task_ids))
+    return {"exported": exported, "filename": f"评估报告-{ctx.job_id[:8]}.zip", "size": os.path.getsize(path)}
+
+
+@job_type("recalculate", concurrency=1)
+def recalculate_job(ctx: JobContext, params: dict):
+    """从评估项重新计算所有任务的汇总统计（分批加锁，可在服务运行时执行）"""
+    from aggregates import repair_all_aggregates
+
+    def progress(done, total):
+        ctx.check_cancelled()
+        ctx.set_progress(done / total if total else 1.0)
+
+    db = SessionLocal()
+    try:
+        mismatches = repair_all_aggregates(db, fix=True, progress=progress)
+    finally:
+        db.close()
+    return {"repaired": len(mismatches), "task_ids": [task_id for task_id, _ in mismatches]}
+
+
+@job_type("rescore", concurrency=1)
+def rescore_job(ctx: JobContext, params: dict):
+    """按当前评分规则重新计算所有任务的得分（在当前进程中分段执行；大批量可用 python rescore.py 多进程执行）"""
+    from rescore import rescore_all
+
+    def progress(done, total):
+        ctx.check_cancelled()
+        ctx.set_progress(done / total if total else 1.0)
+
+    processed, changed_items, changes = rescore_all(
+        template_id=params.get("template_id"), dry_run=bool(params.get("dry_run")), progress=progress
+    )
+    return {
+        "processed": processed,
+        "changed_items": changed_items,
+        "changed_tasks": [
+            {"task_id": task_id, "diff": {name: [old, new] for name, (old, new) in diff.items()}}
+            for task_id, diff in changes
+        ],
+    }
+
+
+@job_type("refresh_analytics", concurrency=1)
+def refresh_analytics_job(ctx: JobContext, params: dict):
+    """从评估项重新生成统计汇总表"""
+    from analytics import rebuild_rollups
+    db = SessionLocal()
+    try:
+        dimension_rows, control_item_rows = rebuild_rollups(db)
+    finally:
+        db.close()
+    return {"dimension_rows": dimension_rows, "control_item_rows": control_item_rows}
+
+
+@job_type("reseed_templates", concurrency=1)
+def reseed_templates_job(ctx: JobContext, params: dict):
+    """按 templates.py 重新导入内置模板，内容有变化的模板会被更新"""
+    from models import StandardTemplate
+    from templates import get_default_templates
+    created, updated = [], []
+    db = SessionLocal()
+    try:
+        for tpl in get_default_templates():
+            ctx.check_cancelled()
+            template = db.query(StandardTemplate).filter(StandardTemplate.id == tpl["id"]).first()
+            if template is None:
+                db.add(StandardTemplate(**tpl))
+                created.append(tpl["id"])
+                continue
+            checksum = template.checksum
+            for key, value in tpl.items():
+                setattr(template, key, value)
+            template.refresh_summary()
+            if template.checksum != checksum:
+                updated.append(tpl["id"])
+        db.commit()
+    finally:
+        db.close()
+    return {"created": created, "updated": updated}
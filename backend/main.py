@@ -1,28 +1,60 @@
 """
 标准自评估系统 - FastAPI 后端
 """
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, select, tuple_, update
 from typing import List, Optional
+from urllib.parse import quote
 from datetime import datetime
 from pydantic import BaseModel
+import base64
 import json
+import mimetypes
 import os
+import zlib
 
 from models import (
-    AssessmentTask, AssessmentItem, StandardTemplate,
-    init_db, get_db, engine, Base
+    AssessmentTask, AssessmentItem, StandardTemplate, Attachment, Job,
+    init_db, get_db, get_async_db, engine, async_engine, Base
 )
 from templates import get_default_templates, RATING_SCORES, RATING_LABELS
+from aggregates import rating_delta, lock_task, apply_task_delta, compute_task_result
+from template_cache import get_cached_template, get_cached_template_async
+from scoring import item_score
+from analytics import (
+    rollup_delta, apply_rollup_delta, remove_task_from_rollups, item_max_score,
+    template_analytics, organization_analytics, dimension_analytics, control_item_analytics
+)
+from export import (
+    EXPORT_FORMATS, EXPORT_MAX_TASKS, report_filename, stream_task_report, stream_reports_zip
+)
+from jobs import runner as job_runner, job_to_dict, JobValidationError
+from storage import store_stream, blob_path, UploadTooLarge, UploadSizeLimitMiddleware, upload_too_large_detail
+from responses import FastJSONResponse, CompressionMiddleware
+from metrics import MetricsMiddleware, instrument_engine, render_metrics
+from profiling import (
+    PROFILE_ENABLED, PROFILE_HEADER, PROFILE_TOKEN, ProfiledRoute, ProfilingMiddleware,
+    is_authorized, list_profiles, load_profile, profile_path
+)
 
 app = FastAPI(
     title="标准自评估系统 API",
     description="网络安全、数据安全标准自评估平台",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
+# 上传大小限制（读取请求体之前按 Content-Length 检查）
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# 响应压缩（brotli / gzip，超过 RESPONSE_COMPRESS_MIN_SIZE 字节的文本类响应）
+app.add_middleware(CompressionMiddleware)
+
 # CORS 配置
 app.add_middleware(
     CORSMiddleware,
@@ -30,13 +62,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Task-Version", "Content-Range", "Accept-Ranges", "Content-Disposition", "X-Profile-Id"],
 )
 
+# 请求性能分析（PROFILE_ENABLED=1 时），路由类须在注册路由之前设置；位于指标中间件之内以记录 SQL
+if PROFILE_ENABLED:
+    app.router.route_class = ProfiledRoute
+    app.add_middleware(ProfilingMiddleware)
+
+# 请求与数据库指标（/api/metrics），最外层以包含压缩耗时
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 # 初始化数据库
 @app.on_event("startup")
 def startup_event():
     Base.metadata.create_all(bind=engine)
     init_db()
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    job_runner.shutdown()
 
 
 # ============ Pydantic 模型 ============
@@ -59,12 +108,47 @@ class AssessmentItemUpdate(BaseModel):
     remarks: Optional[str] = None
 
 
+class AssessmentItemBatchEntry(BaseModel):
+    item_id: int
+    rating: str
+    evidence: Optional[str] = None
+    remarks: Optional[str] = None
+
+
+class AssessmentItemBatchUpdate(BaseModel):
+    items: List[AssessmentItemBatchEntry]
+
+
+class SyncEdit(BaseModel):
+    item_id: int
+    base_version: int  # 客户端编辑时该评估项的版本号
+    rating: str
+    evidence: Optional[str] = None
+    remarks: Optional[str] = None
+
+
+class SyncRequest(BaseModel):
+    since: int = 0  # 客户端上次同步到的任务版本号
+    edits: List[SyncEdit] = []
+
+
+class ExportRequest(BaseModel):
+    task_ids: List[int]
+    format: str = "xlsx"
+
+
+class JobCreate(BaseModel):
+    type: str
+    params: dict = {}
+
+
 class AssessmentResult(BaseModel):
     task_id: int
     total_items: int
     completed_items: int
     total_score: float
     max_score: float
+    weighted_score: float
     compliance_rate: float
     dimension_scores: dict
     level_distribution: dict
@@ -75,7 +159,16 @@ class AssessmentResult(BaseModel):
 @app.get("/api/templates", response_model=List[dict])
 def get_templates(db: Session = Depends(get_db)):
     """获取所有标准模板"""
-    templates = db.query(StandardTemplate).filter(StandardTemplate.is_active == True).all()
+    templates = db.query(
+        StandardTemplate.id,
+        StandardTemplate.name,
+        StandardTemplate.standard_no,
+        StandardTemplate.version,
+        StandardTemplate.description,
+        StandardTemplate.item_count,
+        StandardTemplate.dimension_count,
+        StandardTemplate.checksum
+    ).filter(StandardTemplate.is_active == True).all()
     return [
         {
             "id": t.id,
@@ -83,8 +176,9 @@ def get_templates(db: Session = Depends(get_db)):
             "standard_no": t.standard_no,
             "version": t.version,
             "description": t.description,
-            "dimensions": t.dimensions,
-            "item_count": len(t.items) if t.items else 0
+            "item_count": t.item_count or 0,
+            "dimension_count": t.dimension_count or 0,
+            "checksum": t.checksum
         }
         for t in templates
     ]
@@ -93,26 +187,61 @@ def get_templates(db: Session = Depends(get_db)):
 @app.get("/api/templates/{template_id}")
 def get_template(template_id: str, db: Session = Depends(get_db)):
     """获取模板详情"""
-    template = db.query(StandardTemplate).filter(StandardTemplate.id == template_id).first()
+    template = get_cached_template(db, template_id)
     if not template:
         raise HTTPException(status_code=404, detail="模板不存在")
-    return {
-        "id": template.id,
-        "name": template.name,
-        "standard_no": template.standard_no,
-        "version": template.version,
-        "description": template.description,
-        "dimensions": template.dimensions,
-        "items": template.items
-    }
+    return Response(template.to_json(), media_type="application/json")
 
 
 # ============ 评估任务接口 ============
 
+def encode_task_cursor(updated_at: datetime, task_id: int) -> str:
+    """编码任务列表分页游标"""
+    raw = f"{updated_at.isoformat()}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_task_cursor(cursor: str):
+    """解码任务列表分页游标，返回 (updated_at, id)"""
+    try:
+        updated_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(updated_at), int(task_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
 @app.get("/api/tasks", response_model=List[dict])
-def get_tasks(db: Session = Depends(get_db)):
-    """获取所有评估任务"""
-    tasks = db.query(AssessmentTask).order_by(AssessmentTask.updated_at.desc()).all()
+def get_tasks(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    organization: Optional[str] = None,
+    template_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """获取评估任务列表（按更新时间倒序，游标分页）
+    
+    下一页游标通过响应头 X-Next-Cursor 返回，没有更多数据时不返回该响应头
+    """
+    query = db.query(AssessmentTask)
+    if status:
+        query = query.filter(AssessmentTask.status == status)
+    if organization:
+        query = query.filter(AssessmentTask.organization == organization)
+    if template_id:
+        query = query.filter(AssessmentTask.template_id == template_id)
+    if cursor:
+        query = query.filter(
+            tuple_(AssessmentTask.updated_at, AssessmentTask.id) < tuple_(*decode_task_cursor(cursor))
+        )
+    
+    # 多取一条用于判断是否还有下一页
+    tasks = query.order_by(AssessmentTask.updated_at.desc(), AssessmentTask.id.desc()).limit(limit + 1).all()
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_task_cursor(tasks[-1].updated_at, tasks[-1].id)
+    
     return [
         {
             "id": t.id,
@@ -132,48 +261,157 @@ def get_tasks(db: Session = Depends(get_db)):
 def create_task(task: AssessmentTaskCreate, db: Session = Depends(get_db)):
     """创建新的评估任务"""
     # 验证模板存在
-    template = db.query(StandardTemplate).filter(StandardTemplate.id == task.template_id).first()
+    template = get_cached_template(db, task.template_id)
     if not template:
         raise HTTPException(status_code=404, detail="模板不存在")
     
+    item_count = len(template.items)
     db_task = AssessmentTask(
         name=task.name,
         template_id=task.template_id,
         organization=task.organization,
-        status="draft"
+        status="draft",
+        item_count=item_count,
+        applicable_count=item_count
     )
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    db.flush()  # 获取任务 ID，与评估项在同一事务中提交
+    task_id = db_task.id
     
-    # 初始化评估项
+    # 初始化评估项（批量插入）
     if template.items:
-        for item in template.items:
-            db_item = AssessmentItem(
-                task_id=db_task.id,
-                template_item_id=item["id"],
-                dimension=item.get("dimension", ""),
-                control_item=item.get("content", ""),
-                level=item.get("level", ""),
-                rating="not_started"
-            )
-            db.add(db_item)
-        db.commit()
+        db.execute(insert(AssessmentItem), [
+            {
+                "task_id": task_id,
+                "template_item_id": item["id"],
+                "dimension": item.get("dimension", ""),
+                "control_item": item.get("content", ""),
+                "level": item.get("level", ""),
+                "rating": "not_started",
+                "score": 0.0,
+                "has_attachment": False
+            }
+            for item in template.items
+        ])
+    db.commit()
     
-    return {"id": db_task.id, "message": "评估任务创建成功"}
+    return {"id": task_id, "message": "评估任务创建成功"}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 条件判断（弱比较）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def task_etag(kind: str, task_id: int, version: int, template=None) -> str:
+    """任务 ETag：任务版本号 + 模板校验和（模板评分规则变化时同样失效）"""
+    checksum = (template.checksum or "")[:12] if template else ""
+    return f'W/"{kind}-{task_id}-{version or 0}-{checksum}"'
+
+
+def task_cache_headers(etag: str, version: int) -> dict:
+    # 每次使用前都向服务器验证，未变化时返回 304
+    return {"ETag": etag, "X-Task-Version": str(version or 0), "Cache-Control": "no-cache"}
+
+
+@app.head("/api/tasks/{task_id}")
+def head_task(task_id: int, db: Session = Depends(get_db)):
+    """检查任务是否变化：只查询任务版本号，返回 ETag / X-Task-Version 响应头"""
+    task = db.query(AssessmentTask.template_id, AssessmentTask.version).filter(AssessmentTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    etag = task_etag("task", task_id, task.version, get_cached_template(db, task.template_id))
+    return Response(headers=task_cache_headers(etag, task.version))
+
+
+# 任务详情中评估项的字段；dimension / control_item / level 与模板一致，rating_label 由 rating 决定
+ITEM_FIELDS = [
+    "id", "template_item_id", "dimension", "control_item", "level",
+    "rating", "rating_label", "score", "evidence", "remarks", "version"
+]
+TEMPLATE_DERIVED_FIELDS = {"dimension", "control_item", "level", "rating_label"}
+
+
+def parse_item_fields(fields: Optional[str], compact: bool):
+    """解析 fields 参数，返回按 ITEM_FIELDS 顺序排列的字段列表（始终包含 id）"""
+    selected = set(ITEM_FIELDS)
+    if fields:
+        selected = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = sorted(selected - set(ITEM_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"未知的字段：{', '.join(unknown)}")
+    if compact:
+        selected -= TEMPLATE_DERIVED_FIELDS
+    selected.add("id")
+    return [f for f in ITEM_FIELDS if f in selected]
+
+
+async def query_item_fields(db: AsyncSession, task_id: int, fields):
+    """只查询所需的列，返回 [dict]"""
+    columns = [f for f in fields if f != "rating_label"]
+    if "rating_label" in fields and "rating" not in columns:
+        columns.append("rating")
+    rows = await db.execute(
+        select(*[getattr(AssessmentItem, f) for f in columns])
+        .where(AssessmentItem.task_id == task_id).order_by(AssessmentItem.id)
+    )
+    items = []
+    for row in rows:
+        values = row._asdict()
+        if "rating_label" in fields:
+            values["rating_label"] = RATING_LABELS.get(values["rating"], values["rating"])
+        items.append({f: values[f] for f in fields})
+    return items
 
 
 @app.get("/api/tasks/{task_id}")
-def get_task(task_id: int, db: Session = Depends(get_db)):
-    """获取任务详情"""
-    task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+async def get_task(
+    task_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    fields: Optional[str] = None,
+    compact: bool = False,
+    layout: str = "rows"
+):
+    """获取任务详情
+    
+    - fields: 评估项字段投影（逗号分隔，见 ITEM_FIELDS），id 始终返回
+    - compact: 省略可由模板得到的字段（dimension / control_item / level / rating_label），
+      客户端按 template_item_id 从缓存的模板中查找
+    - layout=columns: 评估项以列数组返回 {"字段": [值, ...]}，省去每项重复的键名
+    
+    支持 If-None-Match 条件请求：任务版本号未变化时返回 304，不查询评估项；
+    响应内容均为 JSON 原生类型，直接返回 FastJSONResponse，跳过 FastAPI 逐值遍历的 jsonable_encoder
+    """
+    if layout not in ("rows", "columns"):
+        raise HTTPException(status_code=400, detail=f"不支持的 layout：{layout}")
+    item_fields = parse_item_fields(fields, compact)
+    
+    task = await db.get(AssessmentTask, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    template = db.query(StandardTemplate).filter(StandardTemplate.id == task.template_id).first()
-    items = db.query(AssessmentItem).filter(AssessmentItem.task_id == task_id).all()
+    template = await get_cached_template_async(db, task.template_id)
+    # 不同的投影是不同的表示，ETag 需要区分
+    kind = "task"
+    if item_fields != ITEM_FIELDS or layout != "rows":
+        representation = ",".join(item_fields) + ";" + layout
+        kind = f"task.{zlib.crc32(representation.encode()):08x}"
+    headers = task_cache_headers(task_etag(kind, task_id, task.version, template), task.version)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
     
-    return {
+    items = await query_item_fields(db, task_id, item_fields)
+    if layout == "columns":
+        items = {f: [item[f] for item in items] for f in item_fields}
+    
+    return FastJSONResponse({
         "id": task.id,
         "name": task.name,
         "template_id": task.template_id,
@@ -182,23 +420,26 @@ def get_task(task_id: int, db: Session = Depends(get_db)):
         "status": task.status,
         "compliance_rate": task.compliance_rate,
         "total_score": task.total_score,
+        "version": task.version,
         "created_at": task.created_at.isoformat(),
         "updated_at": task.updated_at.isoformat(),
-        "items": [
-            {
-                "id": i.id,
-                "template_item_id": i.template_item_id,
-                "dimension": i.dimension,
-                "control_item": i.control_item,
-                "level": i.level,
-                "rating": i.rating,
-                "rating_label": RATING_LABELS.get(i.rating, i.rating),
-                "score": i.score,
-                "evidence": i.evidence,
-                "remarks": i.remarks
-            }
-            for i in items
-        ]
+        "items": items
+    }, headers=headers)
+
+
+def item_to_dict(i: AssessmentItem):
+    return {
+        "id": i.id,
+        "template_item_id": i.template_item_id,
+        "dimension": i.dimension,
+        "control_item": i.control_item,
+        "level": i.level,
+        "rating": i.rating,
+        "rating_label": RATING_LABELS.get(i.rating, i.rating),
+        "score": i.score,
+        "evidence": i.evidence,
+        "remarks": i.remarks,
+        "version": i.version
     }
 
 
@@ -214,6 +455,7 @@ def update_task(task_id: int, task_update: AssessmentTaskUpdate, db: Session = D
         setattr(db_task, key, value)
     
     db_task.updated_at = datetime.now()
+    db_task.version = AssessmentTask.version + 1
     db.commit()
     db.refresh(db_task)
     
@@ -227,7 +469,11 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
     if not db_task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    db.delete(db_task)
+    remove_task_from_rollups(db, db_task)
+    # 按任务批量删除附件和评估项，不经 ORM 级联（级联会逐个评估项加载附件）
+    db.execute(delete(Attachment).where(Attachment.task_id == task_id))
+    db.execute(delete(AssessmentItem).where(AssessmentItem.task_id == task_id))
+    db.execute(delete(AssessmentTask).where(AssessmentTask.id == task_id))
     db.commit()
     
     return {"message": "任务删除成功"}
@@ -236,138 +482,464 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
 # ============ 评估项接口 ============
 
 @app.put("/api/tasks/{task_id}/items/{item_id}")
-def update_item(task_id: int, item_id: int, item_update: AssessmentItemUpdate, db: Session = Depends(get_db)):
-    """更新评估项"""
-    db_item = db.query(AssessmentItem).filter(
-        AssessmentItem.id == item_id,
-        AssessmentItem.task_id == task_id
-    ).first()
-    if not db_item:
-        raise HTTPException(status_code=404, detail="评估项不存在")
-    
-    db_item.rating = item_update.rating
-    if item_update.evidence is not None:
-        db_item.evidence = item_update.evidence
-    if item_update.remarks is not None:
-        db_item.remarks = item_update.remarks
-    
-    # 计算得分
-    if item_update.rating in RATING_SCORES:
-        score_ratio = RATING_SCORES[item_update.rating]
-        if score_ratio is not None:
-            db_item.score = score_ratio * 5  # 假设满分 5 分
-        else:
-            db_item.score = 0  # 不适用
+async def update_item(task_id: int, item_id: int, item_update: AssessmentItemUpdate,
+                      db: AsyncSession = Depends(get_async_db)):
+    """更新评估项（与批量更新共用写入逻辑）"""
+    check_ratings([item_update.rating])
     
-    db.commit()
+    task = (await db.execute(
+        select(AssessmentTask.template_id, AssessmentTask.created_at).where(AssessmentTask.id == task_id)
+    )).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
     
-    # 重新计算任务总分
-    recalculate_task_score(db, task_id)
+    version, current = await db.run_sync(load_current_items, task_id, {item_id})
+    entry = AssessmentItemBatchEntry(item_id=item_id, **item_update.dict())
+    await db.run_sync(write_item_updates, task_id, task, current, [entry], version)
+    await db.commit()
     
     return {"message": "评估项更新成功"}
 
 
-def recalculate_task_score(db: Session, task_id: int):
-    """重新计算任务总分和合规率"""
-    items = db.query(AssessmentItem).filter(AssessmentItem.task_id == task_id).all()
+@app.put("/api/tasks/{task_id}/items")
+def update_items_batch(task_id: int, batch: AssessmentItemBatchUpdate, db: Session = Depends(get_db)):
+    """批量更新评估项（单个事务）"""
+    check_ratings(u.rating for u in batch.items)
+    
+    task = db.query(AssessmentTask.template_id, AssessmentTask.created_at).filter(AssessmentTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
     
-    total_score = sum(i.score for i in items)
-    max_score = len(items) * 5  # 每项满分 5 分
+    version = None
+    if batch.items:
+        version, current = load_current_items(db, task_id, {u.item_id for u in batch.items})
+        write_item_updates(db, task_id, task, current, batch.items, version)
+        db.commit()
     
-    # 计算合规率（排除不适用的项）
-    applicable_items = [i for i in items if i.rating != "not_applicable"]
-    compliant_items = [i for i in applicable_items if i.rating == "compliant"]
+    return {"message": "评估项批量更新成功", "updated": len({u.item_id for u in batch.items}), "version": version}
+
+
+def check_ratings(ratings):
+    invalid = sorted({r for r in ratings if r not in RATING_SCORES})
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"无效的评分：{', '.join(invalid)}")
+
+
+def load_current_items(db: Session, task_id: int, item_ids):
+    """锁定任务并读取待更新评估项的当前值（不提交），返回 (任务新版本号, 评估项 ID -> 行)
     
-    compliance_rate = (len(compliant_items) / len(applicable_items) * 100) if applicable_items else 0
+    先锁定再读取，并发更新同一任务的请求依次执行，汇总增量基于最新的旧值；有不存在的评估项时返回 404
+    """
+    version = lock_task(db, task_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    current = {
+        row.id: row
+        for row in db.query(
+            AssessmentItem.id, AssessmentItem.rating, AssessmentItem.score,
+            AssessmentItem.dimension, AssessmentItem.template_item_id,
+            AssessmentItem.evidence, AssessmentItem.remarks, AssessmentItem.version
+        ).filter(
+            AssessmentItem.task_id == task_id,
+            AssessmentItem.id.in_(item_ids)
+        )
+    }
+    missing = sorted(set(item_ids) - current.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"评估项不存在：{', '.join(map(str, missing))}")
+    return version, current
+
+
+def write_item_updates(db: Session, task_id: int, task, current: dict, updates, version: int):
+    """在当前事务内写入一批评估项更新及汇总增量（不提交）
     
-    db_task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
-    if db_task:
-        db_task.total_score = total_score
-        db_task.compliance_rate = round(compliance_rate, 2)
-        db_task.updated_at = datetime.now()
+    current 和 version 为 load_current_items 的返回值；task 为任务或含 template_id / created_at 的查询行；
+    同一评估项出现多次时以最后一次为准，增量依次累加
+    """
+    template = get_cached_template(db, task.template_id)
+    state = {item_id: (row.rating, row.score) for item_id, row in current.items()}
+    delta = {}
+    rollup = None
+    rows = {}
+    for u in updates:
+        item = current[u.item_id]
+        max_score = item_max_score(template, item.template_item_id)
+        score = item_score(u.rating, max_score)
+        old_rating, old_score = state[u.item_id]
+        rating_delta(old_rating, old_score, u.rating, score, delta)
+        rollup = rollup_delta(
+            item.dimension, item.template_item_id, max_score, old_rating, old_score, u.rating, score, rollup
+        )
+        state[u.item_id] = (u.rating, score)
+        
+        row = rows.setdefault(u.item_id, {"id": u.item_id})
+        row.update(rating=u.rating, score=score)
+        if u.evidence is not None:
+            row["evidence"] = u.evidence
+        if u.remarks is not None:
+            row["remarks"] = u.remarks
+    
+    apply_task_delta(db, task_id, delta)
+    apply_rollup_delta(db, task_id, rollup, task)
+    for row in rows.values():
+        row["version"] = version
+    db.execute(update(AssessmentItem), list(rows.values()))
+
+
+# ============ 增量同步接口 ============
+
+def sync_payload(db: Session, task: AssessmentTask, since: int):
+    """任务信息及版本号大于 since 的评估项；since 为 0 或大于当前版本（如数据库已重建）时返回全部评估项"""
+    full = since <= 0 or since > task.version
+    items = []
+    if full or since < task.version:
+        query = db.query(AssessmentItem).filter(AssessmentItem.task_id == task.id)
+        if not full:
+            query = query.filter(AssessmentItem.version > since)
+        items = query.order_by(AssessmentItem.id).all()
+    return {
+        "task_id": task.id,
+        "version": task.version,
+        "since": since,
+        "full": full,
+        "task": {
+            "name": task.name,
+            "organization": task.organization,
+            "status": task.status,
+            "compliance_rate": task.compliance_rate,
+            "total_score": task.total_score,
+            "updated_at": task.updated_at.isoformat()
+        },
+        "items": [item_to_dict(i) for i in items]
+    }
+
+
+@app.get("/api/tasks/{task_id}/sync")
+def get_task_changes(task_id: int, since: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """增量同步：返回任务版本号 since 之后变化的评估项"""
+    task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return FastJSONResponse(sync_payload(db, task, since))
+
+
+@app.post("/api/tasks/{task_id}/sync")
+def sync_task(task_id: int, request: SyncRequest, db: Session = Depends(get_db)):
+    """提交离线编辑并返回 since 之后变化的评估项
+    
+    每条编辑带有客户端编辑时的评估项版本号（base_version），服务器上该评估项已被他人修改
+    （版本号更大且内容不同）时不写入，作为冲突连同服务器当前值返回，由客户端处理后重新提交
+    """
+    check_ratings(e.rating for e in request.edits)
+    task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    version, current = load_current_items(db, task_id, {e.item_id for e in request.edits})
+    accepted, applied, conflicts = [], [], {}
+    for e in request.edits:
+        item = current[e.item_id]
+        if (item.rating == e.rating
+                and e.evidence in (None, item.evidence)
+                and e.remarks in (None, item.remarks)):
+            applied.append(e.item_id)  # 与服务器一致（如重复提交），无需写入
+        elif item.version > e.base_version:
+            conflicts[e.item_id] = e.base_version
+        else:
+            accepted.append(e)
+            applied.append(e.item_id)
+    
+    if accepted:
+        write_item_updates(db, task_id, task, current, accepted, version)
         db.commit()
+    else:
+        db.rollback()  # 没有写入，撤销 load_current_items 递增的版本号
+    
+    conflict_items = []
+    if conflicts:
+        conflict_items = [
+            {"item_id": i.id, "base_version": conflicts[i.id], "server": item_to_dict(i)}
+            for i in db.query(AssessmentItem).filter(AssessmentItem.id.in_(conflicts)).order_by(AssessmentItem.id)
+        ]
+    
+    payload = sync_payload(db, task, request.since)
+    payload["applied"] = list(dict.fromkeys(applied))
+    payload["conflicts"] = conflict_items
+    return payload
 
 
 @app.get("/api/tasks/{task_id}/result")
-def get_task_result(task_id: int, db: Session = Depends(get_db)):
-    """获取评估结果分析"""
+async def get_task_result(task_id: int, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_async_db)):
+    """获取评估结果分析（支持 If-None-Match 条件请求）"""
+    task = await db.get(AssessmentTask, task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    template = await get_cached_template_async(db, task.template_id)
+    headers = task_cache_headers(task_etag("result", task_id, task.version, template), task.version)
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    return await db.run_sync(compute_task_result, task, template)
+
+
+# ============ 报告导出接口 ============
+
+def content_disposition(filename: str) -> str:
+    """生成支持中文文件名的 Content-Disposition"""
+    fallback = filename.encode("ascii", "ignore").decode() or "download"
+    return f'attachment; filename="{fallback}"; filename*=UTF-8\'\'{quote(filename)}'
+
+
+def check_export_format(fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式：{fmt}")
+
+
+@app.get("/api/tasks/{task_id}/export")
+def export_task(task_id: int, fmt: str = Query("xlsx", alias="format"), db: Session = Depends(get_db)):
+    """导出单个任务的评估报告（xlsx / pdf），分块发送"""
+    check_export_format(fmt)
     task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
     
-    items = db.query(AssessmentItem).filter(AssessmentItem.task_id == task_id).all()
-    template = db.query(StandardTemplate).filter(StandardTemplate.id == task.template_id).first()
-    
-    # 统计
-    total_items = len(items)
-    completed_items = len([i for i in items if i.rating not in ["not_started", "not_applicable"]])
-    total_score = sum(i.score for i in items)
-    max_score = total_items * 5
-    
-    # 维度得分
-    dimension_scores = {}
-    if template and template.dimensions:
-        for dim in template.dimensions:
-            dim_items = [i for i in items if i.dimension == dim["id"]]
-            if dim_items:
-                dim_score = sum(i.score for i in dim_items)
-                dim_max = len(dim_items) * 5
-                dimension_scores[dim["name"]] = round(dim_score / dim_max * 100, 2) if dim_max > 0 else 0
-    
-    # 等级分布
-    level_distribution = {
-        "compliant": len([i for i in items if i.rating == "compliant"]),
-        "partial": len([i for i in items if i.rating == "partial"]),
-        "non_compliant": len([i for i in items if i.rating == "non_compliant"]),
-        "not_applicable": len([i for i in items if i.rating == "not_applicable"])
-    }
+    return StreamingResponse(
+        stream_task_report(task_id, fmt),
+        media_type=EXPORT_FORMATS[fmt][0],
+        headers={"Content-Disposition": content_disposition(report_filename(task, fmt))}
+    )
+
+
+@app.post("/api/exports")
+def export_tasks(export: ExportRequest, db: Session = Depends(get_db)):
+    """批量导出多个任务的评估报告，打包为 ZIP 流式发送"""
+    check_export_format(export.format)
+    task_ids = list(dict.fromkeys(export.task_ids))
+    if not task_ids:
+        raise HTTPException(status_code=400, detail="请选择要导出的任务")
+    if len(task_ids) > EXPORT_MAX_TASKS:
+        raise HTTPException(status_code=400, detail=f"单次最多导出 {EXPORT_MAX_TASKS} 个任务")
     
-    return {
-        "task_id": task_id,
-        "total_items": total_items,
-        "completed_items": completed_items,
-        "total_score": total_score,
-        "max_score": max_score,
-        "compliance_rate": task.compliance_rate,
-        "dimension_scores": dimension_scores,
-        "level_distribution": level_distribution
-    }
+    existing = {i for (i,) in db.query(AssessmentTask.id).filter(AssessmentTask.id.in_(task_ids))}
+    missing = [i for i in task_ids if i not in existing]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"任务不存在：{', '.join(map(str, missing))}")
+    
+    filename = f"评估报告-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip"
+    return StreamingResponse(
+        stream_reports_zip(task_ids, export.format),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(filename)}
+    )
 
 
 # ============ 文件上传接口 ============
 
 @app.post("/api/tasks/{task_id}/items/{item_id}/upload")
-async def upload_evidence(task_id: int, item_id: int, file: UploadFile = File(...)):
-    """上传证据文件"""
-    # 验证任务存在
-    db = SessionLocal()
+async def upload_evidence(task_id: int, item_id: int, file: UploadFile = File(...),
+                          db: AsyncSession = Depends(get_async_db)):
+    """上传证据文件
+    
+    文件分块写入内容寻址存储，哈希计算和磁盘写入在线程池中执行，数据库操作使用异步会话，不阻塞事件循环
+    """
+    db_item = await db.scalar(select(AssessmentItem).where(
+        AssessmentItem.id == item_id,
+        AssessmentItem.task_id == task_id
+    ))
+    if not db_item:
+        raise HTTPException(status_code=404, detail="评估项不存在")
+    
     try:
-        task = db.query(AssessmentTask).filter(AssessmentTask.id == task_id).first()
-        if not task:
-            raise HTTPException(status_code=404, detail="任务不存在")
-        
-        # 保存文件
-        upload_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'uploads', str(task_id))
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        file_path = os.path.join(upload_dir, file.filename)
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # 更新评估项
-        db_item = db.query(AssessmentItem).filter(
-            AssessmentItem.id == item_id,
-            AssessmentItem.task_id == task_id
-        ).first()
-        if db_item:
-            db_item.has_attachment = True
-            db_item.evidence = (db_item.evidence or "") + f"\n[附件：{file.filename}]"
-            db.commit()
-        
-        return {"message": "文件上传成功", "filename": file.filename}
-    finally:
-        db.close()
+        sha256, size = await run_in_threadpool(store_stream, file.file)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=upload_too_large_detail())
+    
+    filename = os.path.basename(file.filename or "") or sha256
+    attachment = Attachment(
+        task_id=task_id,
+        item_id=item_id,
+        filename=filename,
+        sha256=sha256,
+        size=size,
+        content_type=guess_content_type(filename, file.content_type)
+    )
+    
+    db.add(attachment)
+    db_item.has_attachment = True
+    db_item.version = await db.scalar(
+        update(AssessmentTask).where(AssessmentTask.id == task_id)
+        .values(version=AssessmentTask.version + 1).returning(AssessmentTask.version)
+    )
+    await db.commit()
+    
+    return {
+        "message": "文件上传成功",
+        "filename": filename,
+        "attachment_id": attachment.id,
+        "sha256": sha256,
+        "size": size
+    }
+
+
+def guess_content_type(filename: str, declared: Optional[str]) -> str:
+    """优先使用客户端声明的类型，缺失或为通用二进制类型时按扩展名推断"""
+    if declared and declared != "application/octet-stream":
+        return declared
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def attachment_to_dict(a: Attachment):
+    return {
+        "id": a.id,
+        "task_id": a.task_id,
+        "item_id": a.item_id,
+        "filename": a.filename,
+        "sha256": a.sha256,
+        "size": a.size,
+        "content_type": a.content_type,
+        "created_at": a.created_at.isoformat()
+    }
+
+
+@app.get("/api/tasks/{task_id}/attachments", response_model=List[dict])
+def get_attachments(task_id: int, item_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """获取任务（或指定评估项）的附件列表"""
+    query = db.query(Attachment).filter(Attachment.task_id == task_id)
+    if item_id is not None:
+        query = query.filter(Attachment.item_id == item_id)
+    return [attachment_to_dict(a) for a in query.order_by(Attachment.id).all()]
+
+
+@app.api_route("/api/tasks/{task_id}/attachments/{attachment_id}", methods=["GET", "HEAD"])
+def download_attachment(task_id: int, attachment_id: int, request: Request, db: Session = Depends(get_db)):
+    """下载附件
+    
+    支持 Range / If-Range 断点续传与 If-None-Match 条件请求，ETag 即文件内容的 SHA-256；
+    文件由 FileResponse 分块发送，服务器支持 pathsend 扩展时直接零拷贝发送
+    """
+    attachment = db.query(Attachment).filter(
+        Attachment.id == attachment_id,
+        Attachment.task_id == task_id
+    ).first()
+    if not attachment:
+        raise HTTPException(status_code=404, detail="附件不存在")
+    
+    etag = f'"{attachment.sha256}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    path = blob_path(attachment.sha256)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="附件文件不存在")
+    
+    return FileResponse(
+        path,
+        media_type=attachment.content_type or "application/octet-stream",
+        filename=attachment.filename,
+        content_disposition_type="inline",
+        headers={"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    )
+
+
+# ============ 后台任务接口 ============
+
+@app.post("/api/jobs")
+def submit_job(job: JobCreate, db: Session = Depends(get_db)):
+    """提交后台任务（export / recalculate / reseed_templates）"""
+    try:
+        db_job = job_runner.submit(db, job.type, job.params)
+    except JobValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_to_dict(db_job)
+
+
+@app.get("/api/jobs", response_model=List[dict])
+def get_jobs(
+    status: Optional[str] = None,
+    job_type: Optional[str] = Query(None, alias="type"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """获取最近的后台任务"""
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    if job_type:
+        query = query.filter(Job.job_type == job_type)
+    return [job_to_dict(j) for j in query.order_by(Job.created_at.desc()).limit(limit).all()]
+
+
+def get_job_or_404(db: Session, job_id: str) -> Job:
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="后台任务不存在")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    """查询后台任务状态"""
+    return job_to_dict(get_job_or_404(db, job_id))
+
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str, db: Session = Depends(get_db)):
+    """获取后台任务结果，有结果文件时直接下载"""
+    job = get_job_or_404(db, job_id)
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"任务尚未完成（{job.status}）")
+    if job.result_path:
+        if not os.path.exists(job.result_path):
+            raise HTTPException(status_code=410, detail="结果文件已清理")
+        filename = (job.result or {}).get("filename") or os.path.basename(job.result_path)
+        return FileResponse(
+            job.result_path,
+            headers={"Content-Disposition": content_disposition(filename)}
+        )
+    return job.result
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, db: Session = Depends(get_db)):
+    """取消后台任务"""
+    return job_to_dict(job_runner.cancel(db, get_job_or_404(db, job_id)))
+
+
+# ============ 统计分析接口 ============
+
+@app.get("/api/analytics/templates", response_model=List[dict])
+def get_template_analytics(db: Session = Depends(get_db)):
+    """各标准模板的任务数和平均合规率"""
+    return template_analytics(db)
+
+
+@app.get("/api/analytics/organizations", response_model=List[dict])
+def get_organization_analytics(template_id: Optional[str] = None, db: Session = Depends(get_db)):
+    """各被评估组织的任务数和平均合规率，可按模板筛选"""
+    return organization_analytics(db, template_id)
+
+
+@app.get("/api/analytics/dimensions", response_model=List[dict])
+def get_dimension_analytics(
+    template_id: str,
+    since: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db)
+):
+    """模板各维度按月（任务创建月份）的合规率趋势，since 格式为 YYYY-MM"""
+    return dimension_analytics(db, template_id, since)
+
+
+@app.get("/api/analytics/control-items", response_model=List[dict])
+def get_control_item_analytics(
+    template_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """跨任务不符合次数最多的控制项"""
+    return control_item_analytics(db, template_id, limit)
 
 
 # ============ 系统接口 ============
@@ -378,6 +950,48 @@ def health_check():
     return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
 
+@app.get("/api/metrics")
+def get_metrics():
+    """Prometheus 格式的请求与数据库指标（当前进程）"""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+# ============ 请求性能分析 ============
+
+def check_profile_access(request: Request):
+    if not PROFILE_ENABLED:
+        raise HTTPException(status_code=404, detail="请求分析未开启")
+    if PROFILE_TOKEN is not None and not is_authorized(request.headers.get(PROFILE_HEADER)):
+        raise HTTPException(status_code=403, detail=f"需要有效的 {PROFILE_HEADER} 请求头")
+
+
+@app.get("/api/profiles", response_model=List[dict])
+def get_profiles(request: Request, limit: int = Query(50, ge=1, le=500)):
+    """最近的请求分析结果"""
+    check_profile_access(request)
+    return list_profiles(limit)
+
+
+@app.get("/api/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    """请求分析摘要：耗时、执行的 SQL 及按累计耗时排列的函数统计"""
+    check_profile_access(request)
+    profile = load_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="分析结果不存在")
+    return profile
+
+
+@app.get("/api/profiles/{profile_id}/pstats")
+def download_profile(profile_id: str, request: Request):
+    """下载 pstats 文件（python -m pstats 或 snakeviz 查看）"""
+    check_profile_access(request)
+    path = profile_path(profile_id, ".prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail="分析结果不存在")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+
 @app.get("/api/stats")
 def get_stats(db: Session = Depends(get_db)):
     """获取系统统计"""
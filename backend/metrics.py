@@ -0,0 +1,237 @@
+"""
+请求与数据库指标
+- MetricsMiddleware: 按路由模板记录请求数、延迟直方图、进行中的请求数，以及每个请求执行的 SQL 条数和耗时
+- instrument_engine: 通过 SQLAlchemy 游标事件统计 SQL 条数和耗时，超过阈值的语句写入慢查询日志（logger "sql.slow"）
+- track_job: 后台任务的耗时和 SQL 统计
+- render_metrics: Prometheus 文本格式输出（/api/metrics）
+
+指标保存在进程内存中，多个 worker 进程各自统计，由 Prometheus 分别抓取
+
+环境变量:
+    DB_SLOW_QUERY_MS   慢查询日志阈值（毫秒），默认 200，0 表示关闭
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS") or 200)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+slow_query_log = logging.getLogger("sql.slow")
+
+_lock = threading.Lock()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {} if labels else {(): 0}
+
+    def inc(self, label_values=(), amount: float = 1):
+        with _lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.buckets = tuple(buckets)
+        self.values = {}  # 标签值 -> [各桶计数..., 总和, 总数]
+
+    def observe(self, value: float, label_values=()):
+        i = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self.values.get(label_values)
+            if state is None:
+                state = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for label_values, state in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labels + ("le",), label_values + ("+Inf",))
+            yield f"{self.name}_bucket{labels} {state[-1]}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {_number(state[-2])}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {state[-1]}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+REQUESTS = Counter("http_requests_total", "HTTP 请求数", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（秒）", LATENCY_BUCKETS, ("method", "route")
+)
+IN_PROGRESS = Gauge("http_requests_in_progress", "进行中的 HTTP 请求数")
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries", "每个请求执行的 SQL 条数", QUERY_COUNT_BUCKETS, ("method", "route")
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds", "每个请求的 SQL 总耗时（秒）", LATENCY_BUCKETS, ("method", "route")
+)
+JOB_LATENCY = Histogram("job_duration_seconds", "后台任务耗时（秒）", LATENCY_BUCKETS + (60.0, 300.0), ("type", "status"))
+JOB_DB_QUERIES = Counter("job_db_queries_total", "后台任务执行的 SQL 条数", ("type",))
+JOB_DB_TIME = Counter("job_db_duration_seconds_total", "后台任务的 SQL 总耗时（秒）", ("type",))
+DB_QUERIES = Counter("db_queries_total", "SQL 执行条数（含请求之外的查询）")
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "单条 SQL 耗时（秒）", QUERY_LATENCY_BUCKETS)
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "超过慢查询阈值的 SQL 条数")
+
+ALL_METRICS = [
+    REQUESTS, REQUEST_LATENCY, IN_PROGRESS, REQUEST_DB_QUERIES, REQUEST_DB_TIME,
+    JOB_LATENCY, JOB_DB_QUERIES, JOB_DB_TIME, DB_QUERIES, DB_QUERY_LATENCY, DB_SLOW_QUERIES,
+]
+
+
+class QueryStats:
+    """一个请求或后台任务内执行的 SQL 统计（线程池中执行的同步接口共享同一个对象）"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = None  # 设为列表时记录每条 SQL（请求分析，见 profiling.py）
+
+
+_current = ContextVar("query_stats", default=None)
+
+
+def current_query_stats():
+    """当前请求或后台任务的 QueryStats，不在其中时返回 None"""
+    return _current.get()
+
+
+def instrument_engine(engine):
+    """在引擎上注册游标事件（异步引擎传入 async_engine.sync_engine）"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _record_query(statement, parameters, time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+def _record_query(statement: str, parameters, seconds: float):
+    DB_QUERIES.inc()
+    DB_QUERY_LATENCY.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+        if stats.statements is not None:
+            stats.statements.append((statement, parameters, seconds))
+    if SLOW_QUERY_MS > 0 and seconds * 1000 >= SLOW_QUERY_MS:
+        DB_SLOW_QUERIES.inc()
+        slow_query_log.warning(
+            "慢查询 %.1f ms [%s]: %s", seconds * 1000, stats.label if stats else "-", " ".join(statement.split())[:2000]
+        )
+
+
+def _route_label(scope) -> str:
+    # 路由模板（如 /api/tasks/{task_id}），未匹配的路径统一归类，避免标签数量无限增长
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """记录每个 HTTP 请求的延迟、状态码和 SQL 统计（纯 ASGI 中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc(amount=1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.inc(amount=-1)
+            _current.reset(token)
+            labels = (scope["method"], _route_label(scope))
+            REQUESTS.inc(labels + (str(status),))
+            REQUEST_LATENCY.observe(elapsed, labels)
+            REQUEST_DB_QUERIES.observe(stats.count, labels)
+            REQUEST_DB_TIME.observe(stats.seconds, labels)
+
+
+@contextmanager
+def track_job(type_name: str):
+    """统计后台任务的耗时和 SQL；调用方通过 yield 的 dict 设置 status"""
+    stats = QueryStats(f"job:{type_name}")
+    token = _current.set(stats)
+    outcome = {"status": "succeeded"}
+    start = time.perf_counter()
+    try:
+        yield outcome
+    finally:
+        _current.reset(token)
+        JOB_LATENCY.observe(time.perf_counter() - start, (type_name, outcome["status"]))
+        JOB_DB_QUERIES.inc((type_name,), stats.count)
+        JOB_DB_TIME.inc((type_name,), stats.seconds)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,200 @@
+"""
+数据库结构迁移
+Base.metadata.create_all 只会创建缺失的表，不会修改已部署数据库中的现有表，
+新增的列和索引通过这里的版本化迁移补齐，已执行的版本记录在 schema_migrations 表中
+
+迁移函数需保持幂等：新建的数据库由 create_all 直接生成最新结构，迁移只做检查后跳过
+
+每个迁移分为结构变更和数据回填两步：
+- 结构变更只能使用迁移编写时的表结构（列名、索引定义写在迁移中），不能通过当前的 ORM 模型读写数据，
+  否则之后版本新增的列尚未创建时会出错
+- 数据回填在本次所有结构变更完成之后执行，此时数据库结构与当前模型一致，可以使用 ORM 和业务函数
+- 版本在回填完成后才记录，中途失败时下次执行会重新进行结构变更（幂等）和回填
+
+使用方法（在 backend 目录下执行）:
+    python migrations.py            # 执行未应用的迁移
+    python migrations.py --status   # 查看迁移状态
+"""
+from datetime import datetime
+import argparse
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from models import (
+    engine, Base, SessionLocal, StandardTemplate,
+    DimensionRollup, ControlItemRollup
+)
+
+_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(200)),
+    Column("applied_at", DateTime, default=datetime.now),
+)
+
+
+def add_columns(table: str, columns):
+    """为表补充缺失的列，columns 为 [(列名, 列定义)]，返回实际新增的列名"""
+    existing = {c["name"] for c in inspect(engine).get_columns(table)}
+    added = [name for name, _ in columns if name not in existing]
+    with engine.begin() as conn:
+        for name, ddl in columns:
+            if name in added:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+    return added
+
+
+def create_index(name: str, table: str, columns):
+    """创建索引（已存在时跳过）；迁移中写明索引定义，不依赖当前模型上的索引"""
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+# ============ 迁移 ============
+
+def _task_aggregate_columns():
+    add_columns("assessment_tasks", [
+        ("item_count", "INTEGER DEFAULT 0"),
+        ("applicable_count", "INTEGER DEFAULT 0"),
+        ("compliant_count", "INTEGER DEFAULT 0"),
+        ("partial_count", "INTEGER DEFAULT 0"),
+        ("non_compliant_count", "INTEGER DEFAULT 0"),
+        ("not_applicable_count", "INTEGER DEFAULT 0"),
+    ])
+
+
+def _backfill_task_aggregates():
+    from aggregates import repair_all_aggregates
+    db = SessionLocal()
+    try:
+        repair_all_aggregates(db)
+    finally:
+        db.close()
+
+
+def _template_summary_columns():
+    add_columns("standard_templates", [
+        ("item_count", "INTEGER DEFAULT 0"),
+        ("dimension_count", "INTEGER DEFAULT 0"),
+        ("checksum", "VARCHAR(64)"),
+    ])
+
+
+def _backfill_template_summaries():
+    db = SessionLocal()
+    try:
+        for template in db.query(StandardTemplate).all():
+            template.refresh_summary()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _task_list_indexes():
+    create_index("ix_assessment_tasks_updated", "assessment_tasks", ["updated_at", "id"])
+    create_index("ix_assessment_tasks_status_updated", "assessment_tasks", ["status", "updated_at", "id"])
+    create_index("ix_assessment_tasks_org_updated", "assessment_tasks", ["organization", "updated_at", "id"])
+    create_index("ix_assessment_tasks_template_updated", "assessment_tasks", ["template_id", "updated_at", "id"])
+
+
+def _item_indexes():
+    create_index("ix_assessment_items_task_id", "assessment_items", ["task_id"])
+    create_index("ix_assessment_items_task_dimension_rating", "assessment_items", ["task_id", "dimension", "rating"])
+
+
+def _analytics_rollups():
+    Base.metadata.create_all(bind=engine, tables=[DimensionRollup.__table__, ControlItemRollup.__table__])
+
+
+def _backfill_rollups():
+    from analytics import rebuild_rollups
+    db = SessionLocal()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+
+
+def _task_version_column():
+    add_columns("assessment_tasks", [("version", "INTEGER DEFAULT 1")])
+
+
+def _item_version_column():
+    add_columns("assessment_items", [("version", "INTEGER DEFAULT 1")])
+    create_index("ix_assessment_items_task_version", "assessment_items", ["task_id", "version"])
+
+
+def _rollup_max_score_column():
+    add_columns("dimension_rollups", [("max_score_sum", "FLOAT DEFAULT 0")])
+
+
+# (版本, 说明, 结构变更, 数据回填)，只能追加，不要修改已发布的版本号
+MIGRATIONS = [
+    (1, "任务汇总统计列", _task_aggregate_columns, _backfill_task_aggregates),
+    (2, "模板摘要列", _template_summary_columns, _backfill_template_summaries),
+    (3, "任务列表分页索引", _task_list_indexes, None),
+    (4, "评估项 task_id / (task_id, dimension, rating) 索引", _item_indexes, None),
+    (5, "统计汇总表", _analytics_rollups, _backfill_rollups),
+    (6, "任务版本号列", _task_version_column, None),
+    (7, "评估项版本号列及索引", _item_version_column, None),
+    (8, "维度汇总满分合计列", _rollup_max_score_column, _backfill_rollups),
+]
+
+
+def applied_versions():
+    """已执行的迁移版本"""
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return {row.version for row in conn.execute(select(schema_migrations.c.version))}
+
+
+def mark_all_applied(bind):
+    """将所有迁移标记为已执行（用于由 create_all 直接建立的新数据库）"""
+    _metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        done = {row.version for row in conn.execute(select(schema_migrations.c.version))}
+        for version, name, *_ in MIGRATIONS:
+            if version not in done:
+                conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+
+
+def run_migrations():
+    """执行所有未应用的迁移，返回本次执行的版本列表"""
+    applied = applied_versions()
+    pending = [m for m in MIGRATIONS if m[0] not in applied]
+    for _, _, upgrade, _ in pending:
+        upgrade()
+    # 数据回填使用当前的 ORM 模型，须在所有结构变更之后执行
+    for _, _, _, backfill in pending:
+        if backfill is not None:
+            backfill()
+    with engine.begin() as conn:
+        for version, name, _, _ in pending:
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.now()))
+    return [version for version, *_ in pending]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库结构迁移")
+    parser.add_argument("--status", action="store_true", help="仅显示迁移状态")
+    args = parser.parse_args()
+
+    if args.status:
+        applied = applied_versions()
+        for version, name, *_ in MIGRATIONS:
+            mark = "✅" if version in applied else "⏳"
+            print(f"{mark} {version:03d} {name}")
+        return
+
+    Base.metadata.create_all(bind=engine)
+    executed = run_migrations()
+    if executed:
+        print(f"✅ 已执行迁移：{', '.join(f'{v:03d}' for v in executed)}")
+    else:
+        print("✅ 数据库结构已是最新")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+请求性能分析（按需开启）
+PROFILE_ENABLED=1 时，带 X-Profile 请求头的请求在 cProfile 下执行接口函数并记录执行的 SQL（语句、参数、耗时），
+结果保存到 PROFILE_DIR：<id>.prof 为 pstats 文件（可用 snakeviz 等工具查看），<id>.json 为摘要；
+响应头 X-Profile-Id 返回分析 ID，通过 GET /api/profiles/{id} 查看摘要、GET /api/profiles/{id}/pstats 下载
+
+- 接口函数由 ProfiledRoute 包装：同步接口在线程池线程中、异步接口在事件循环线程中启用 profiler；
+  异步接口等待 IO 期间事件循环处理的其他请求也会计入，建议在低流量时使用
+- 同一进程同时只分析一个请求，其余带请求头的请求正常执行（响应头 X-Profile-Skipped）
+- 设置 PROFILE_TOKEN 时请求头的值必须与之相同，查看分析结果的接口同样需要该请求头
+
+环境变量:
+    PROFILE_ENABLED   是否允许请求分析，默认 0
+    PROFILE_TOKEN     X-Profile 请求头需匹配的令牌，未设置时任意非空值即可
+    PROFILE_DIR       分析结果目录，默认 data/profiles
+    PROFILE_KEEP      保留的分析结果数量，默认 100
+"""
+from contextvars import ContextVar
+from datetime import datetime
+import cProfile
+import functools
+import glob
+import hmac
+import inspect
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+from metrics import current_query_stats
+
+PROFILE_ENABLED = (os.environ.get("PROFILE_ENABLED") or "0").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN") or None
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(os.path.dirname(__file__), '..', 'data', 'profiles')
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP") or 100)
+PROFILE_HEADER = "X-Profile"
+TOP_FUNCTIONS = 40  # 摘要中按累计耗时列出的函数数
+MAX_PARAMETERS_LENGTH = 500
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$")
+
+_active = ContextVar("profile_session", default=None)
+_busy = threading.Lock()
+
+
+def profiled(call):
+    """包装接口函数：当前请求开启了分析时在 profiler 下执行"""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return await call(*args, **kwargs)
+            profiler.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                profiler.disable()
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        profiler = _active.get()
+        if profiler is None:
+            return call(*args, **kwargs)
+        profiler.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.disable()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """接口函数经 profiled 包装的路由（需在注册路由之前设置为 app.router.route_class）"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+def is_authorized(header_value) -> bool:
+    """X-Profile 请求头是否允许分析 / 查看分析结果"""
+    if not PROFILE_ENABLED or not header_value:
+        return False
+    return PROFILE_TOKEN is None or hmac.compare_digest(header_value.encode(), PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """对带 X-Profile 请求头的请求开启分析并保存结果（需位于 MetricsMiddleware 之内以记录 SQL）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"].startswith("/api/profiles")
+                or not is_authorized(Headers(scope=scope).get(PROFILE_HEADER))):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            await self.app(scope, receive, _with_header(send, "X-Profile-Skipped", "busy"))
+            return
+
+        try:
+            profile_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+            profiler = cProfile.Profile()
+            stats = current_query_stats()
+            if stats is not None:
+                stats.statements = []
+            status = 500
+
+            async def send_with_id(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    MutableHeaders(raw=message["headers"])["X-Profile-Id"] = profile_id
+                await send(message)
+
+            token = _active.set(profiler)
+            start = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                elapsed = time.perf_counter() - start
+                _active.reset(token)
+                statements = stats.statements if stats is not None else []
+                await run_in_threadpool(save_profile, profile_id, scope, status, elapsed, profiler, statements)
+        finally:
+            _busy.release()
+
+
+def _with_header(send, name: str, value: str):
+    async def wrapped(message):
+        if message["type"] == "http.response.start":
+            MutableHeaders(raw=message["headers"])[name] = value
+        await send(message)
+    return wrapped
+
+
+def save_profile(profile_id: str, scope, status: int, elapsed: float, profiler: cProfile.Profile, statements):
+    """保存 pstats 文件和 JSON 摘要，并清理超出保留数量的旧结果"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, profile_id)
+    profiler.dump_stats(base + ".prof")
+
+    out = io.StringIO()
+    try:
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    except TypeError:  # 接口函数未执行（如 404），没有分析数据
+        pass
+
+    summary = {
+        "id": profile_id,
+        "method": scope["method"],
+        "path": scope["path"],
+        "query_string": scope.get("query_string", b"").decode("latin-1"),
+        "route": getattr(scope.get("route"), "path", None),
+        "status": status,
+        "created_at": datetime.now().isoformat(),
+        "duration_ms": round(elapsed * 1000, 2),
+        "sql_count": len(statements),
+        "sql_ms": round(sum(seconds for _, _, seconds in statements) * 1000, 2),
+        "sql": [
+            {
+                "statement": " ".join(statement.split()),
+                "parameters": repr(parameters)[:MAX_PARAMETERS_LENGTH],
+                "duration_ms": round(seconds * 1000, 3),
+            }
+            for statement, parameters, seconds in statements
+        ],
+        "profile": out.getvalue(),
+    }
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for path in sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")))[:-PROFILE_KEEP]:
+        for old in (path, path[:-len(".json")] + ".prof"):
+            if os.path.exists(old):
+                os.remove(old)
+
+
+def profile_path(profile_id: str, suffix: str):
+    """分析结果文件路径，ID 格式不正确或文件不存在时返回 None"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def list_profiles(limit: int = 50):
+    """最近的分析结果（不含 SQL 和函数统计明细）"""
+    result = []
+    for path in sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), reverse=True)[:limit]:
+        with open(path, encoding="utf-8") as f:
+            summary = json.load(f)
+        result.append({k: v for k, v in summary.items() if k not in ("sql", "profile")})
+    return result
+
+
+def load_profile(profile_id: str):
+    path = profile_path(profile_id, ".json")
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,213 @@
+"""
+批量重新评分
+RATING_SCORES、模板中的 max_score 或维度权重调整后，按评分引擎（scoring.py）重新计算所有任务的评估项得分和汇总统计
+
+任务按 ID 分段，每段由进程池中的一个进程锁定、读取、计算并批量写回（每段一个事务）；
+--dry-run 只计算并列出得分会发生变化的任务，不写数据库
+
+使用方法（在 backend 目录下执行）:
+    python rescore.py --dry-run                 # 预览变化
+    python rescore.py                           # 重新评分并写回
+    python rescore.py --workers 8 --chunk-size 200 --template djcp_data
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
+import time
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models import AssessmentTask, AssessmentItem, SessionLocal, engine
+from aggregates import AGGREGATE_COLUMNS, aggregate_items, diff_aggregates
+from scoring import ScoringModel
+from template_cache import get_cached_template
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def task_ranges(db: Session, chunk_size: int, template_id: str = None):
+    """按任务 ID 顺序分段，返回 [(起始 ID, 结束 ID, 任务数)]"""
+    query = db.query(AssessmentTask.id)
+    if template_id:
+        query = query.filter(AssessmentTask.template_id == template_id)
+    ids = [task_id for (task_id,) in query.order_by(AssessmentTask.id)]
+    return [
+        (ids[i], ids[min(i + chunk_size, len(ids)) - 1], min(chunk_size, len(ids) - i))
+        for i in range(0, len(ids), chunk_size)
+    ]
+
+
+def lock_range(db: Session, first_id: int, last_id: int, template_id: str = None):
+    """锁定一段任务直到事务结束（不修改数据，PostgreSQL 行锁，SQLite 数据库写锁）
+
+    读取评估项之前调用：并发的评估项更新（lock_task）在本段写回提交之后才能执行，
+    按读到的评估项计算的汇总值写回时不会覆盖其他请求的修改
+    """
+    stmt = update(AssessmentTask).where(AssessmentTask.id.between(first_id, last_id))
+    if template_id:
+        stmt = stmt.where(AssessmentTask.template_id == template_id)
+    db.execute(stmt.values(version=AssessmentTask.version))
+
+
+def rescore_range(first_id: int, last_id: int, template_id: str = None, dry_run: bool = False):
+    """重新计算一段任务的得分，返回 (任务数, 变化的评估项数, [(任务 ID, 汇总差异)])"""
+    db = SessionLocal()
+    try:
+        if not dry_run:
+            lock_range(db, first_id, last_id, template_id)
+        tasks = db.query(AssessmentTask.id, AssessmentTask.template_id, *[
+            getattr(AssessmentTask, name) for name in AGGREGATE_COLUMNS + ["compliance_rate"]
+        ]).filter(AssessmentTask.id.between(first_id, last_id))
+        if template_id:
+            tasks = tasks.filter(AssessmentTask.template_id == template_id)
+        tasks = {t.id: t for t in tasks}
+
+        items = {}
+        for row in db.query(
+            AssessmentItem.id, AssessmentItem.task_id, AssessmentItem.template_item_id,
+            AssessmentItem.dimension, AssessmentItem.rating, AssessmentItem.score
+        ).filter(AssessmentItem.task_id.between(first_id, last_id)).order_by(AssessmentItem.id):
+            if row.task_id in tasks:
+                items.setdefault(row.task_id, []).append(row)
+
+        item_rows, task_rows, changes = [], [], []
+        changed_tasks = set()
+        item_tasks = {}  # 评估项 ID -> 任务 ID
+        for task_id, task in tasks.items():
+            rows = items.get(task_id, [])
+            template = get_cached_template(db, task.template_id)
+            model = template.scoring if template else ScoringModel.for_items(
+                (r.template_item_id, r.dimension) for r in rows
+            )
+            item_scores = model.score(model.encode((r.template_item_id, r.rating) for r in rows))["item_scores"]
+
+            new_scores = []
+            for r in rows:
+                i = model.item_index.get(r.template_item_id)
+                score = item_scores[i] if i is not None else (r.score or 0.0)
+                new_scores.append((r.rating, score))
+                if abs((r.score or 0.0) - score) > 1e-9:
+                    item_rows.append({"id": r.id, "score": score})
+                    changed_tasks.add(task_id)
+                    item_tasks[r.id] = task_id
+
+            expected = aggregate_items(new_scores)
+            diff = diff_aggregates(task, expected)
+            if diff:
+                changes.append((task_id, diff))
+                task_rows.append({"id": task_id, **expected})
+                changed_tasks.add(task_id)
+
+        if not dry_run and (item_rows or task_rows):
+            if task_rows:
+                db.execute(update(AssessmentTask), task_rows)
+            # 变化的任务递增版本号使客户端缓存失效，变化的评估项记录新版本号供增量同步
+            versions = dict(db.execute(
+                update(AssessmentTask).where(AssessmentTask.id.in_(changed_tasks))
+                .values(version=AssessmentTask.version + 1)
+                .returning(AssessmentTask.id, AssessmentTask.version)
+            ).all())
+            if item_rows:
+                for row in item_rows:
+                    row["version"] = versions[item_tasks[row["id"]]]
+                db.execute(update(AssessmentItem), item_rows)
+            db.commit()
+        return len(tasks), len(item_rows), changes
+    finally:
+        db.close()
+
+
+def _init_worker():
+    # 子进程不能复用父进程的数据库连接
+    engine.dispose(close=False)
+
+
+def rescore_all(workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE, template_id: str = None,
+                dry_run: bool = False, progress=None):
+    """重新评分所有任务，返回 (任务数, 变化的评估项数, [(任务 ID, 汇总差异)])
+
+    workers <= 1 时在当前进程中顺序执行；progress(已处理任务数, 总任务数) 在每段完成后调用
+    """
+    db = SessionLocal()
+    try:
+        ranges = task_ranges(db, chunk_size, template_id)
+    finally:
+        db.close()
+    total = sum(count for _, _, count in ranges)
+
+    processed = changed_items = 0
+    changes = []
+
+    def collect(result):
+        nonlocal processed, changed_items
+        processed += result[0]
+        changed_items += result[1]
+        changes.extend(result[2])
+        if progress:
+            progress(processed, total)
+
+    try:
+        if workers <= 1 or len(ranges) <= 1:
+            for first_id, last_id, _ in ranges:
+                collect(rescore_range(first_id, last_id, template_id, dry_run))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(rescore_range, first_id, last_id, template_id, dry_run)
+                    for first_id, last_id, _ in ranges
+                ]
+                for future in as_completed(futures):
+                    collect(future.result())
+    finally:
+        # 维度汇总表中的得分随评估项得分变化（中途取消时已提交的分段同样需要）
+        if not dry_run and changed_items:
+            from analytics import rebuild_rollups
+            db = SessionLocal()
+            try:
+                rebuild_rollups(db)
+            finally:
+                db.close()
+
+    changes.sort()
+    return processed, changed_items, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按当前评分规则重新计算所有任务的得分")
+    parser.add_argument("--dry-run", action="store_true", help="只列出会发生变化的任务，不写数据库")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="并行进程数")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每段任务数")
+    parser.add_argument("--template", help="只处理指定模板的任务")
+    args = parser.parse_args()
+
+    if engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:"):
+        parser.error("内存数据库不支持多进程重新评分")
+
+    start = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - start
+        print(f"   已处理 {done}/{total} 个任务，{done / elapsed:.0f} 任务/秒", end="\r")
+
+    print(f"🔄 重新评分{'（预览）' if args.dry_run else ''}：{args.workers} 个进程，每段 {args.chunk_size} 个任务")
+    processed, changed_items, changes = rescore_all(
+        args.workers, args.chunk_size, args.template, args.dry_run, progress
+    )
+    elapsed = time.perf_counter() - start
+    print()
+
+    for task_id, diff in changes:
+        fields = ", ".join(f"{name}: {old} -> {new}" for name, (old, new) in diff.items())
+        print(f"任务 {task_id}: {fields}")
+
+    rate = processed / elapsed if elapsed else 0
+    summary = f"{processed} 个任务，{len(changes)} 个任务汇总变化，{changed_items} 个评估项得分变化，用时 {elapsed:.1f} 秒（{rate:.0f} 任务/秒）"
+    if args.dry_run:
+        print(f"👀 预览完成：{summary}")
+    else:
+        print(f"✅ 重新评分完成：{summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+响应序列化与压缩
+- FastJSONResponse: 安装了 orjson 时用 orjson 序列化（比标准库 json 快数倍），否则回退到 json.dumps，
+  输出与 FastAPI 默认的 JSONResponse 相同（UTF-8、不转义中文、无多余空格）
+- CompressionMiddleware: 文本类响应超过阈值时按 Accept-Encoding 压缩，优先 brotli（需安装 brotli 包），否则 gzip；
+  流式响应、部分内容（206）、已编码的响应和文件下载（带 Accept-Ranges / Content-Disposition / 强 ETag）原样返回
+
+环境变量:
+    RESPONSE_COMPRESS_MIN_SIZE   压缩阈值（字节），默认 1024
+    RESPONSE_GZIP_LEVEL          gzip 压缩级别（1-9），默认 6
+    RESPONSE_BROTLI_QUALITY      brotli 压缩质量（0-11），默认 5
+"""
+import gzip
+import json
+import os
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("RESPONSE_COMPRESS_MIN_SIZE") or 1024)
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL") or 6)
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY") or 5)
+THREAD_MIN_SIZE = 256 * 1024  # 超过该大小的响应体在线程池中压缩，避免阻塞事件循环
+
+COMPRESSIBLE_TYPES = {"application/json", "application/javascript", "application/xml", "image/svg+xml"}
+
+
+def dumps(content) -> bytes:
+    """序列化为 UTF-8 编码的 JSON"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """使用 dumps 序列化的 JSON 响应，作为全局默认响应类"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def available_encodings():
+    """当前环境支持的压缩编码，按优先级排列"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str):
+    """按 Accept-Encoding 选择压缩编码，客户端不接受任何可用编码时返回 None"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    for encoding in available_encodings():
+        if encoding in accepted or "*" in accepted:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def is_file_download(headers) -> bool:
+    """文件下载的字节范围和强 ETag 对应原始内容，压缩后不再成立"""
+    etag = headers.get("etag")
+    return ("accept-ranges" in headers or "content-disposition" in headers
+            or (etag is not None and not etag.startswith("W/")))
+
+
+class CompressionMiddleware:
+    """对单次发送的文本类响应体做 brotli / gzip 压缩（纯 ASGI 中间件）"""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE,
+                 gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None  # 暂存的 http.response.start，确定是否压缩后再发送
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (message["status"] == 206 or "content-encoding" in headers or is_file_download(headers)
+                        or not is_compressible(headers.get("content-type", ""))):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body":
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # 流式响应和小响应不压缩
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_SIZE:
+                body = await run_in_threadpool(compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            passthrough = True
+            await send(start)
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
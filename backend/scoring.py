@@ -0,0 +1,126 @@
+"""
+评分引擎
+按模板中评估项的 max_score 和维度 weight 计算评估项得分、维度得分率和加权总分
+
+任务的评分以紧凑数组表示：按模板评估项顺序排列的评分编码（bytearray，每项 1 字节）；
+模板的满分、所属维度、维度权重预先展开为数组（ScoringModel，随模板缓存），
+计算时对评分数组做一次遍历即可得到全部得分，API 和批量重新评分共用
+
+- 得分 = 评分系数（RATING_SCORES）× 评估项满分，未评估为 0
+- 不适用的评估项不计入得分和满分
+- 维度得分率 = 维度得分 / 维度满分；加权总分按维度权重对得分率加权平均（满分为 0 的维度不参与）
+"""
+from array import array
+
+from templates import RATING_SCORES
+
+DEFAULT_MAX_SCORE = 5.0
+
+# 评分编码：0 为未评估，其余按 RATING_SCORES 的顺序
+RATINGS = ("not_started",) + tuple(RATING_SCORES)
+RATING_CODES = {rating: code for code, rating in enumerate(RATINGS)}
+_RATIOS = (0.0,) + tuple(RATING_SCORES.values())
+NOT_APPLICABLE = RATING_CODES["not_applicable"]
+MISSING = 255  # 任务中不存在的模板评估项
+
+
+def item_score(rating: str, max_score: float = DEFAULT_MAX_SCORE) -> float:
+    """单个评估项得分"""
+    return (RATING_SCORES.get(rating) or 0.0) * max_score
+
+
+class ScoringModel:
+    """模板的评分参数（只读）"""
+
+    def __init__(self, dimensions, items):
+        self.dimension_ids = [dim["id"] for dim in dimensions]
+        self.dimension_names = [dim["name"] for dim in dimensions]
+        weights = [dim.get("weight") for dim in dimensions]
+        dim_index = {dim_id: i for i, dim_id in enumerate(self.dimension_ids)}
+
+        self.item_ids = []
+        self.item_index = {}
+        self.max_scores = array("d")
+        self.item_dimensions = array("H")
+        for item in items:
+            dimension = item.get("dimension", "")
+            if dimension not in dim_index:
+                dim_index[dimension] = len(self.dimension_ids)
+                self.dimension_ids.append(dimension)
+                self.dimension_names.append(dimension)
+                weights.append(None)
+            self.item_index[item["id"]] = len(self.item_ids)
+            self.item_ids.append(item["id"])
+            self.max_scores.append(float(item.get("max_score") or DEFAULT_MAX_SCORE))
+            self.item_dimensions.append(dim_index[dimension])
+
+        # 模板未定义权重时各维度等权
+        if all(w is None for w in weights):
+            weights = [1.0] * len(weights)
+        self.weights = [float(w or 0.0) for w in weights]
+
+    @classmethod
+    def for_items(cls, rows):
+        """模板不存在时，按任务自身的评估项 (template_item_id, dimension) 构建（默认满分、等权）"""
+        return cls([], [{"id": item_id, "dimension": dimension or ""} for item_id, dimension in rows])
+
+    def max_score_of(self, template_item_id) -> float:
+        i = self.item_index.get(template_item_id)
+        return self.max_scores[i] if i is not None else DEFAULT_MAX_SCORE
+
+    def encode(self, ratings) -> bytearray:
+        """(template_item_id, rating) 序列 -> 评分数组；模板中没有的评估项忽略"""
+        codes = bytearray([MISSING]) * len(self.item_ids)
+        for template_item_id, rating in ratings:
+            i = self.item_index.get(template_item_id)
+            if i is not None:
+                codes[i] = RATING_CODES.get(rating, 0)
+        return codes
+
+    def score(self, codes: bytearray) -> dict:
+        """一次遍历计算评估项得分、维度得分和加权总分"""
+        n_dims = len(self.dimension_ids)
+        dim_score = [0.0] * n_dims
+        dim_max = [0.0] * n_dims
+        dim_items = [0] * n_dims
+        counts = [0] * len(RATINGS)
+        item_scores = array("d", bytes(8 * len(codes)))
+
+        for i, (code, max_score, d) in enumerate(zip(codes, self.max_scores, self.item_dimensions)):
+            if code == MISSING:
+                continue
+            counts[code] += 1
+            dim_items[d] += 1
+            if code == NOT_APPLICABLE:
+                continue
+            s = _RATIOS[code] * max_score
+            item_scores[i] = s
+            dim_score[d] += s
+            dim_max[d] += max_score
+
+        dimensions = []
+        weighted_sum = weight_total = 0.0
+        for d in range(n_dims):
+            if not dim_items[d]:
+                continue
+            rate = dim_score[d] / dim_max[d] * 100 if dim_max[d] else 0.0
+            if dim_max[d]:
+                weighted_sum += rate * self.weights[d]
+                weight_total += self.weights[d]
+            dimensions.append({
+                "id": self.dimension_ids[d],
+                "name": self.dimension_names[d],
+                "weight": self.weights[d],
+                "score": dim_score[d],
+                "max_score": dim_max[d],
+                "rate": round(rate, 2),
+            })
+
+        return {
+            "item_scores": item_scores,
+            "rating_counts": dict(zip(RATINGS, counts)),
+            "total_score": sum(dim_score),
+            "max_score": sum(dim_max),
+            "weighted_score": round(weighted_sum / weight_total, 2) if weight_total else 0.0,
+            "dimensions": dimensions,
+        }
@@ -0,0 +1,112 @@
+"""
+证据文件存储
+文件按 SHA-256 内容寻址保存在 data/uploads/<前两位>/<三四位>/<哈希> 下，相同内容只存一份
+这里的函数都是阻塞 IO，异步接口中需通过线程池调用；
+UploadSizeLimitMiddleware 在读取请求体之前按 Content-Length 拒绝超过大小限制的上传
+
+环境变量:
+    UPLOAD_DIR             存储目录，默认 data/uploads
+    UPLOAD_MAX_SIZE_MB     单个文件大小上限（MB），默认 50
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from starlette.datastructures import Headers
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR") or os.path.join(os.path.dirname(__file__), '..', 'data', 'uploads')
+MAX_UPLOAD_SIZE = int(os.environ.get("UPLOAD_MAX_SIZE_MB") or 50) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+MULTIPART_OVERHEAD = 64 * 1024  # 请求体中除文件内容外的 multipart 边界和字段头
+
+UPLOAD_PATH_PATTERN = re.compile(r"^/api/tasks/\d+/items/\d+/upload$")
+
+
+class UploadTooLarge(Exception):
+    """上传文件超过大小限制"""
+
+
+def blob_path(sha256: str) -> str:
+    """内容哈希对应的文件路径"""
+    return os.path.join(UPLOAD_DIR, sha256[:2], sha256[2:4], sha256)
+
+
+def store_stream(fileobj, max_size: int = MAX_UPLOAD_SIZE):
+    """分块读取文件对象并写入存储，返回 (sha256, 字节数)
+
+    先写入临时文件并同时计算哈希，完成后原子地移动到内容地址；内容已存在时直接丢弃临时文件
+    """
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return sha256, size
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def upload_too_large_detail(max_size: int = MAX_UPLOAD_SIZE) -> str:
+    return f"文件大小超过限制（最大 {max_size // (1024 * 1024)} MB）"
+
+
+class UploadSizeLimitMiddleware:
+    """上传接口的 Content-Length 超过限制时直接返回 413（纯 ASGI 中间件）
+
+    multipart 请求体在调用接口函数之前就会被完整读取并写入临时文件，接口内的大小检查无法避免这部分开销；
+    未提供 Content-Length 的分块上传仍由 store_stream 在写入时检查
+    """
+
+    def __init__(self, app, max_size: int = MAX_UPLOAD_SIZE, path_pattern=UPLOAD_PATH_PATTERN):
+        self.app = app
+        self.max_size = max_size
+        self.path_pattern = path_pattern
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] == "http" and scope["method"] == "POST"
+                and self.path_pattern.match(scope["path"])
+                and self._content_length(scope) > self.max_size + MULTIPART_OVERHEAD):
+            body = json.dumps({"detail": upload_too_large_detail(self.max_size)}, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 413,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _content_length(scope) -> int:
+        try:
+            return int(Headers(scope=scope).get("content-length") or 0)
+        except ValueError:
+            return 0
@@ -0,0 +1,150 @@
+"""
+标准模板缓存
+模板在 init_db 之后基本不变，缓存解析后的模板及常用索引，避免每次请求都查询并反序列化 JSON 列
+
+- 每次取用时只查询模板的摘要列（checksum、名称、版本等，STAMP_COLUMNS）与缓存比对，
+  不一致时重新加载，其他进程（多 worker）或直接修改数据库写入的模板不会读到旧值
+- 当前进程通过 ORM 写入模板时，在事务提交后（after_commit）使缓存失效
+"""
+from itertools import chain
+import threading
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import StandardTemplate
+from scoring import ScoringModel
+from responses import dumps
+
+# 用于校验缓存是否过期的列（不含 dimensions / items 这两个 JSON 列，checksum 即其摘要）
+STAMP_COLUMNS = (
+    StandardTemplate.checksum, StandardTemplate.name, StandardTemplate.standard_no,
+    StandardTemplate.version, StandardTemplate.description, StandardTemplate.is_active,
+)
+
+
+class CachedTemplate:
+    """解析后的模板及索引（只读，调用方不要修改其中的数据）"""
+
+    def __init__(self, template: StandardTemplate):
+        self.id = template.id
+        self.name = template.name
+        self.standard_no = template.standard_no
+        self.version = template.version
+        self.description = template.description
+        self.is_active = template.is_active
+        self.checksum = template.checksum
+        self.dimensions = template.dimensions or []
+        self.items = template.items or []
+
+        # 评估项 ID -> 评估项
+        self.items_by_id = {item["id"]: item for item in self.items}
+        # 维度 ID -> 评估项列表
+        self.items_by_dimension = {dim["id"]: [] for dim in self.dimensions}
+        for item in self.items:
+            self.items_by_dimension.setdefault(item.get("dimension", ""), []).append(item)
+        # 维度 ID -> 名称 / 权重
+        self.dimension_info = {
+            dim["id"]: {"name": dim["name"], "weight": dim.get("weight")}
+            for dim in self.dimensions
+        }
+        # 评分参数（满分、维度、权重数组）
+        self.scoring = ScoringModel(self.dimensions, self.items)
+        self.stamp = tuple(getattr(template, column.key) for column in STAMP_COLUMNS)
+        self._json = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "standard_no": self.standard_no,
+            "version": self.version,
+            "description": self.description,
+            "checksum": self.checksum,
+            "dimensions": self.dimensions,
+            "items": self.items
+        }
+
+    def to_json(self) -> bytes:
+        """to_dict() 序列化后的 JSON（首次调用时生成，模板详情接口直接返回）"""
+        if self._json is None:
+            self._json = dumps(self.to_dict())
+        return self._json
+
+
+_lock = threading.Lock()
+_cache = {}  # 模板 ID -> CachedTemplate
+
+
+def _stamp_query(template_id: str):
+    return select(*STAMP_COLUMNS).where(StandardTemplate.id == template_id)
+
+
+def _validated(template_id: str, stamp) -> Optional[CachedTemplate]:
+    """缓存中与数据库摘要列一致的模板；模板已删除时清除缓存"""
+    if stamp is None:
+        invalidate_template(template_id)
+        return None
+    cached = _cache.get(template_id)
+    return cached if cached is not None and cached.stamp == tuple(stamp) else None
+
+
+def get_cached_template(db: Session, template_id: str) -> Optional[CachedTemplate]:
+    """获取模板，未命中或已过期时从数据库加载"""
+    cached = _validated(template_id, db.execute(_stamp_query(template_id)).first())
+    if cached is not None:
+        return cached
+
+    template = db.query(StandardTemplate).filter(StandardTemplate.id == template_id).first()
+    if not template:
+        return None
+
+    cached = CachedTemplate(template)
+    with _lock:
+        _cache[template_id] = cached
+    return cached
+
+
+async def get_cached_template_async(db: AsyncSession, template_id: str) -> Optional[CachedTemplate]:
+    """异步会话中获取模板：命中缓存时只查询摘要列，未命中时通过 run_sync 加载"""
+    cached = _validated(template_id, (await db.execute(_stamp_query(template_id))).first())
+    if cached is not None:
+        return cached
+    return await db.run_sync(get_cached_template, template_id)
+
+
+def invalidate_template(template_id: Optional[str] = None):
+    """使指定模板（或全部模板）的缓存失效"""
+    with _lock:
+        if template_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(template_id, None)
+
+
+# 写入的模板 ID 记录在会话上，提交后才使缓存失效：提交前并发的请求仍会读到旧数据，
+# 若在 flush 时失效，这些请求会把旧数据重新放入缓存
+_PENDING_KEY = "template_cache_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_template_writes(session, flush_context):
+    ids = {
+        obj.id for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, StandardTemplate)
+    }
+    if ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    for template_id in session.info.pop(_PENDING_KEY, ()):
+        invalidate_template(template_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,84 @@
+"""
+测试环境
+后端模块在导入时按环境变量创建数据库引擎，这里在导入之前把数据库和数据目录指向临时目录
+
+运行（在仓库根目录下执行）:
+    python -m pytest backend/tests
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DIR = tempfile.mkdtemp(prefix="assessment-tests-")
+atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'assessments.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["UPLOAD_DIR"] = os.path.join(TEST_DIR, "uploads")
+os.environ["JOB_OUTPUT_DIR"] = os.path.join(TEST_DIR, "jobs")
+os.environ["PROFILE_ENABLED"] = "0"
+
+
+@pytest.fixture(scope="session")
+def client():
+    """启动应用（执行 startup 事件：建表、迁移、导入内置模板）的测试客户端"""
+    from starlette.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture
+def task(client):
+    """基于内置模板新建的任务，返回 (任务 ID, 评估项列表)"""
+    task_id = client.post("/api/tasks", json={
+        "name": "测试任务", "template_id": "djcp_data", "organization": "测试单位"
+    }).json()["id"]
+    return task_id, client.get(f"/api/tasks/{task_id}").json()["items"]
+
+
+class Interleave:
+    """在被测函数内部插入一次并发写入：module.name 第一次返回后从另一个线程执行 write
+
+    被测代码已加锁时 write 会阻塞到其事务结束，这里最多等待 wait 秒后让被测代码继续
+    """
+
+    def __init__(self, monkeypatch, wait=1.0):
+        self.monkeypatch = monkeypatch
+        self.wait = wait
+        self.threads = []
+        self.results = []
+
+    def after(self, module, name, write):
+        original = getattr(module, name)
+
+        def wrapper(*args, **kwargs):
+            result = original(*args, **kwargs)
+            if not self.threads:
+                thread = threading.Thread(target=lambda: self.results.append(write()))
+                self.threads.append(thread)
+                thread.start()
+                thread.join(self.wait)
+            return result
+
+        self.monkeypatch.setattr(module, name, wrapper)
+
+    def join(self):
+        """等待并发写入完成，返回其结果"""
+        for thread in self.threads:
+            thread.join()
+        return self.results
+
+
+@pytest.fixture
+def interleave(monkeypatch):
+    return Interleave(monkeypatch)
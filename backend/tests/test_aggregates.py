@@ -0,0 +1,34 @@
+"""
+任务汇总列的校验 / 修复与并发的评估项更新
+"""
+from sqlalchemy import text
+
+import aggregates
+from models import SessionLocal, engine
+
+
+def test_repair_does_not_overwrite_concurrent_updates(client, task, interleave):
+    task_id, items = task
+    client.put(f"/api/tasks/{task_id}/items", json={"items": [
+        {"item_id": item["id"], "rating": "compliant"} for item in items[:5]
+    ]})
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE assessment_tasks SET compliant_count = 0 WHERE id = :id"), {"id": task_id})
+
+    interleave.after(aggregates, "_rating_groups", lambda: client.put(
+        f"/api/tasks/{task_id}/items", json={"items": [{"item_id": items[10]["id"], "rating": "compliant"}]}
+    ).status_code)
+    db = SessionLocal()
+    try:
+        repaired = aggregates.repair_all_aggregates(db, fix=True)
+    finally:
+        db.close()
+    assert interleave.join() == [200]
+    assert task_id in [t for t, _ in repaired]
+
+    db = SessionLocal()
+    try:
+        assert aggregates.repair_all_aggregates(db, fix=False, batch_size=2) == []
+    finally:
+        db.close()
+    assert client.get(f"/api/tasks/{task_id}/result").json()["level_distribution"]["compliant"] == 6
@@ -0,0 +1,28 @@
+"""
+统计汇总表的全量重建与并发的评估项更新
+"""
+import analytics
+from models import SessionLocal
+
+
+def test_rebuild_does_not_lose_concurrent_deltas(client, task, interleave):
+    task_id, items = task
+    client.put(f"/api/tasks/{task_id}/items", json={"items": [
+        {"item_id": item["id"], "rating": "partial"} for item in items[:5]
+    ]})
+
+    interleave.after(analytics, "compute_rollups", lambda: client.put(
+        f"/api/tasks/{task_id}/items", json={"items": [{"item_id": items[10]["id"], "rating": "compliant"}]}
+    ).status_code)
+    db = SessionLocal()
+    try:
+        analytics.rebuild_rollups(db)
+    finally:
+        db.close()
+    assert interleave.join() == [200]
+
+    db = SessionLocal()
+    try:
+        assert analytics.check_rollups(db) == []
+    finally:
+        db.close()
@@ -0,0 +1,165 @@
+"""
+升级已部署的数据库：从初始版本的表结构执行全部迁移
+"""
+import json
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+import analytics
+import migrations
+from aggregates import repair_all_aggregates
+from analytics import check_rollups
+from database import create_db_engine
+from models import Base
+from templates import RATING_SCORES, get_default_templates
+
+# 初始版本由 create_all 生成的表结构（迁移之前已部署的数据库）
+BASELINE_SCHEMA = [
+    """CREATE TABLE assessment_tasks (
+        id INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        template_id VARCHAR(50) NOT NULL,
+        organization VARCHAR(200),
+        created_at DATETIME,
+        updated_at DATETIME,
+        status VARCHAR(20),
+        total_score FLOAT,
+        compliance_rate FLOAT,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE INDEX ix_assessment_tasks_id ON assessment_tasks (id)",
+    """CREATE TABLE standard_templates (
+        id VARCHAR(50) NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        standard_no VARCHAR(50),
+        version VARCHAR(20),
+        description TEXT,
+        dimensions JSON,
+        items JSON,
+        created_at DATETIME,
+        is_active BOOLEAN,
+        PRIMARY KEY (id)
+    )""",
+    """CREATE TABLE assessment_items (
+        id INTEGER NOT NULL,
+        task_id INTEGER NOT NULL,
+        template_item_id VARCHAR(100) NOT NULL,
+        dimension VARCHAR(100),
+        control_item TEXT,
+        level VARCHAR(20),
+        rating VARCHAR(20),
+        score FLOAT,
+        evidence TEXT,
+        remarks TEXT,
+        has_attachment BOOLEAN,
+        PRIMARY KEY (id),
+        FOREIGN KEY(task_id) REFERENCES assessment_tasks (id)
+    )""",
+    "CREATE INDEX ix_assessment_items_id ON assessment_items (id)",
+]
+
+RATINGS = ["compliant", "partial", "non_compliant", "not_applicable", "not_started"]
+TASK_COUNT = 3
+
+
+@pytest.fixture
+def baseline_engine(tmp_path, monkeypatch):
+    """初始版本结构的数据库（含模板、任务和已评分的评估项），迁移模块改为使用该数据库"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    template = get_default_templates()[0]
+    with engine.begin() as conn:
+        for ddl in BASELINE_SCHEMA:
+            conn.execute(text(ddl))
+        conn.execute(text(
+            "INSERT INTO standard_templates (id, name, standard_no, version, description, dimensions, items, "
+            "created_at, is_active) VALUES (:id, :name, :standard_no, :version, :description, :dimensions, :items, "
+            "'2024-01-15 10:00:00', 1)"
+        ), {
+            **{k: template.get(k) for k in ("id", "name", "standard_no", "version", "description")},
+            "dimensions": json.dumps(template["dimensions"], ensure_ascii=False),
+            "items": json.dumps(template["items"], ensure_ascii=False),
+        })
+        for task_id in range(1, TASK_COUNT + 1):
+            conn.execute(text(
+                "INSERT INTO assessment_tasks (id, name, template_id, created_at, updated_at, status, "
+                "total_score, compliance_rate) VALUES (:id, :name, :template_id, '2024-01-15 10:00:00', "
+                "'2024-01-15 10:00:00', 'in_progress', 0, 0)"
+            ), {"id": task_id, "name": f"任务 {task_id}", "template_id": template["id"]})
+            for n, item in enumerate(template["items"]):
+                rating = RATINGS[(n + task_id) % len(RATINGS)]
+                conn.execute(text(
+                    "INSERT INTO assessment_items (task_id, template_item_id, dimension, control_item, level, "
+                    "rating, score, has_attachment) VALUES (:task_id, :item_id, :dimension, :control_item, "
+                    ":level, :rating, :score, 0)"
+                ), {
+                    "task_id": task_id, "item_id": item["id"], "dimension": item["dimension"],
+                    "control_item": item.get("content", ""), "level": item.get("level"),
+                    "rating": rating, "score": (RATING_SCORES.get(rating) or 0.0) * 5,
+                })
+
+    monkeypatch.setattr(migrations, "engine", engine)
+    monkeypatch.setattr(migrations, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def start_app(engine):
+    """与 init_db 相同：create_all 补齐缺失的表后执行迁移"""
+    Base.metadata.create_all(bind=engine)
+    return migrations.run_migrations()
+
+
+def test_upgrade_baseline_database(baseline_engine):
+    executed = start_app(baseline_engine)
+
+    assert executed == [version for version, *_ in migrations.MIGRATIONS]
+    assert migrations.applied_versions() == set(executed)
+
+    # 迁移后的结构与当前模型一致
+    inspector = inspect(baseline_engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        assert {c.name for c in table.columns} <= columns, table.name
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        assert {i.name for i in table.indexes} <= indexes, table.name
+
+    # 回填后的汇总列和统计汇总表与评估项一致
+    db = migrations.SessionLocal()
+    try:
+        assert repair_all_aggregates(db, fix=False) == []
+        assert check_rollups(db) == []
+        counts = db.execute(text("SELECT item_count, applicable_count FROM assessment_tasks")).all()
+        assert len(counts) == TASK_COUNT
+        assert all(item_count > applicable_count > 0 for item_count, applicable_count in counts)
+    finally:
+        db.close()
+
+    # 再次启动不重复执行
+    assert start_app(baseline_engine) == []
+
+
+def test_failed_backfill_is_retried(baseline_engine, monkeypatch):
+    def fail(db):
+        raise RuntimeError("回填中断")
+
+    monkeypatch.setattr(analytics, "rebuild_rollups", fail)
+    with pytest.raises(RuntimeError):
+        start_app(baseline_engine)
+    # 结构变更已完成，但迁移未记录
+    assert migrations.applied_versions() == set()
+    monkeypatch.undo()
+    monkeypatch.setattr(migrations, "engine", baseline_engine)
+    monkeypatch.setattr(
+        migrations, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=baseline_engine)
+    )
+
+    # 列已存在，下次启动仍执行回填
+    start_app(baseline_engine)
+    db = migrations.SessionLocal()
+    try:
+        assert repair_all_aggregates(db, fix=False) == []
+        assert check_rollups(db) == []
+    finally:
+        db.close()
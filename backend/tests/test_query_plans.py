@@ -0,0 +1,101 @@
+"""
+热点接口的查询计划：记录接口实际执行的 SQL，用 EXPLAIN QUERY PLAN 检查是否命中索引（仅 SQLite）
+"""
+from contextlib import contextmanager
+import re
+
+import pytest
+from sqlalchemy import event
+
+from models import engine, async_engine
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="查询计划校验仅支持 SQLite")
+
+HOT_TABLES = re.compile(r"\bassessment_(items|tasks)\b")
+# 未使用索引的全表扫描；按索引顺序扫描（SCAN ... USING INDEX）用于任务列表排序，不算全表扫描
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?assessment_(items|tasks)\b(?!.*\bUSING\b)")
+
+
+@contextmanager
+def query_plans():
+    """记录期间执行的、涉及评估任务/评估项表的查询，退出时填充 [(SQL, [查询计划])]"""
+    statements, plans = [], []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if (not executemany and HOT_TABLES.search(statement)
+                and statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))):
+            statements.append((statement, parameters))
+
+    engines = [engine, async_engine.sync_engine]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", capture)
+    try:
+        yield plans
+    finally:
+        for e in engines:
+            event.remove(e, "before_cursor_execute", capture)
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plans.append((statement, [row[-1] for row in rows]))
+
+
+def full_scans(plans):
+    return [(statement, detail) for statement, details in plans for detail in details if FULL_SCAN.search(detail)]
+
+
+def uses_index(plans, index):
+    return any(re.search(rf"USING (COVERING )?INDEX {index}\b", detail) for _, details in plans for detail in details)
+
+
+def test_hot_paths_avoid_full_table_scans(client, task):
+    task_id, items = task
+    with query_plans() as plans:
+        client.get("/api/tasks", params={"limit": 2})
+        client.get(f"/api/tasks/{task_id}")
+        client.put(f"/api/tasks/{task_id}/items/{items[0]['id']}", json={"rating": "compliant"})
+        client.put(f"/api/tasks/{task_id}/items", json={"items": [
+            {"item_id": items[1]["id"], "rating": "partial"},
+            {"item_id": items[2]["id"], "rating": "not_applicable"},
+        ]})
+        version = client.get(f"/api/tasks/{task_id}/sync").json()["version"]
+        client.post(f"/api/tasks/{task_id}/sync", json={"since": version, "edits": [
+            {"item_id": items[3]["id"], "base_version": 0, "rating": "non_compliant"},
+        ]})
+        client.get(f"/api/tasks/{task_id}/result")
+        client.delete(f"/api/tasks/{task_id}")
+
+    assert plans
+    assert full_scans(plans) == []
+
+
+def test_sync_uses_task_version_index(client, task):
+    task_id, items = task
+    client.put(f"/api/tasks/{task_id}/items/{items[0]['id']}", json={"rating": "compliant"})
+    with query_plans() as plans:
+        client.get(f"/api/tasks/{task_id}/sync", params={"since": 1})
+    assert uses_index(plans, "ix_assessment_items_task_version")
+
+
+def test_delete_uses_dimension_rating_index(client, task):
+    task_id, items = task
+    client.put(f"/api/tasks/{task_id}/items/{items[0]['id']}", json={"rating": "partial"})
+    with query_plans() as plans:
+        assert client.delete(f"/api/tasks/{task_id}").status_code == 200
+    assert uses_index(plans, "ix_assessment_items_task_dimension_rating")
+    assert full_scans(plans) == []
+
+
+@pytest.mark.parametrize("params, index", [
+    ({}, "ix_assessment_tasks_updated"),
+    ({"status": "draft"}, "ix_assessment_tasks_status_updated"),
+    ({"organization": "测试单位"}, "ix_assessment_tasks_org_updated"),
+    ({"template_id": "djcp_data"}, "ix_assessment_tasks_template_updated"),
+])
+def test_task_list_uses_index(client, task, params, index):
+    with query_plans() as plans:
+        response = client.get("/api/tasks", params={"limit": 1, **params})
+        client.get("/api/tasks", params={"limit": 1, "cursor": response.headers.get("X-Next-Cursor"), **params})
+    assert uses_index(plans, index)
+    assert full_scans(plans) == []
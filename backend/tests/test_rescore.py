@@ -0,0 +1,34 @@
+"""
+批量重新评分与并发的评估项更新
+"""
+from sqlalchemy import text
+
+import rescore
+from aggregates import repair_all_aggregates
+from models import SessionLocal, engine
+
+
+def test_rescore_does_not_overwrite_concurrent_updates(client, task, interleave):
+    task_id, items = task
+    client.put(f"/api/tasks/{task_id}/items", json={"items": [
+        {"item_id": item["id"], "rating": "compliant"} for item in items[:10]
+    ]})
+    # 模拟评分规则调整：存储的得分和汇总与当前规则不一致，重新评分会写回该任务
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE assessment_items SET score = 0 WHERE id = :id"), {"id": items[0]["id"]})
+        conn.execute(text("UPDATE assessment_tasks SET total_score = total_score - 5 WHERE id = :id"), {"id": task_id})
+
+    interleave.after(rescore, "get_cached_template", lambda: client.put(
+        f"/api/tasks/{task_id}/items", json={"items": [{"item_id": items[20]["id"], "rating": "compliant"}]}
+    ).status_code)
+    processed, changed_items, changes = rescore.rescore_range(task_id, task_id)
+    assert interleave.join() == [200]
+    assert (processed, changed_items, len(changes)) == (1, 1, 1)
+
+    db = SessionLocal()
+    try:
+        assert repair_all_aggregates(db, fix=False) == []
+    finally:
+        db.close()
+    result = client.get(f"/api/tasks/{task_id}/result").json()
+    assert result["level_distribution"]["compliant"] == 11
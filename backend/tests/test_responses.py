@@ -0,0 +1,28 @@
+"""
+响应压缩
+"""
+
+
+def test_file_download_is_not_compressed(client, task):
+    task_id, items = task
+    content = "证据内容\n".encode() * 200
+    attachment = client.post(f"/api/tasks/{task_id}/items/{items[0]['id']}/upload",
+                             files={"file": ("证据.txt", content, "text/plain")}).json()
+    url = f"/api/tasks/{task_id}/attachments/{attachment['attachment_id']}"
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == f'"{attachment["sha256"]}"'
+    assert response.content == content
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip", "Range": "bytes=0-99"})
+    assert response.status_code == 206
+    assert response.content == content[:100]
+
+
+def test_json_with_weak_etag_is_compressed(client, task):
+    task_id, _ = task
+    response = client.get(f"/api/tasks/{task_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"].startswith("W/")
+    assert response.json()["id"] == task_id
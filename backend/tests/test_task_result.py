@@ -0,0 +1,80 @@
+"""
+评估结果接口：与改为 GROUP BY 聚合之前逐项统计的实现结果一致
+"""
+import pytest
+
+RATINGS = ["compliant", "partial", "non_compliant", None]
+# 与原实现有意不同的字段：不适用项不再计入满分（见 scoring.py），weighted_score / dimension_details 为新增
+SHARED_KEYS = {
+    "task_id", "total_items", "completed_items", "total_score", "max_score",
+    "compliance_rate", "dimension_scores", "level_distribution",
+}
+
+
+def per_item_result(task, items, template):
+    """原 get_task_result 的逐项统计（每项满分 5）"""
+    total_items = len(items)
+    dimension_scores = {}
+    for dim in template["dimensions"]:
+        dim_items = [i for i in items if i["dimension"] == dim["id"]]
+        if dim_items:
+            dim_score = sum(i["score"] for i in dim_items)
+            dimension_scores[dim["name"]] = round(dim_score / (len(dim_items) * 5) * 100, 2)
+    return {
+        "task_id": task["id"],
+        "total_items": total_items,
+        "completed_items": len([i for i in items if i["rating"] not in ["not_started", "not_applicable"]]),
+        "total_score": sum(i["score"] for i in items),
+        "max_score": total_items * 5,
+        "compliance_rate": task["compliance_rate"],
+        "dimension_scores": dimension_scores,
+        "level_distribution": {
+            rating: len([i for i in items if i["rating"] == rating])
+            for rating in ("compliant", "partial", "non_compliant", "not_applicable")
+        },
+    }
+
+
+def rate_items(client, task_id, items, ratings):
+    """按评估项顺序循环使用 ratings 批量评分（None 为保持未评估）"""
+    response = client.put(f"/api/tasks/{task_id}/items", json={"items": [
+        {"item_id": item["id"], "rating": ratings[n % len(ratings)]}
+        for n, item in enumerate(items) if ratings[n % len(ratings)]
+    ]})
+    assert response.status_code == 200
+
+
+def results(client, task_id):
+    task = client.get(f"/api/tasks/{task_id}").json()
+    template = client.get(f"/api/templates/{task['template_id']}").json()
+    actual = client.get(f"/api/tasks/{task_id}/result").json()
+    return actual, per_item_result(task, task["items"], template)
+
+
+@pytest.mark.parametrize("ratings", [
+    RATINGS,
+    ["compliant"],
+    [None],
+    ["partial", "partial", "compliant"],
+])
+def test_result_matches_per_item_implementation(client, task, ratings):
+    task_id, items = task
+    rate_items(client, task_id, items, ratings)
+    actual, expected = results(client, task_id)
+
+    assert {key: actual[key] for key in SHARED_KEYS} == expected
+    # 覆盖模板的所有维度
+    assert len(expected["dimension_scores"]) == len({i["dimension"] for i in items}) > 1
+
+
+def test_result_with_not_applicable_items(client, task):
+    task_id, items = task
+    rate_items(client, task_id, items, RATINGS + ["not_applicable"])
+    actual, expected = results(client, task_id)
+    not_applicable = expected["level_distribution"]["not_applicable"]
+    assert not_applicable > 0
+
+    for key in SHARED_KEYS - {"max_score", "dimension_scores"}:
+        assert actual[key] == expected[key], key
+    assert actual["max_score"] == expected["max_score"] - 5 * not_applicable
+    assert actual["dimension_scores"].keys() == expected["dimension_scores"].keys()
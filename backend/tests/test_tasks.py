@@ -0,0 +1,37 @@
+"""
+评估任务接口
+"""
+from sqlalchemy import event, func, select
+
+from models import Attachment, AssessmentItem, SessionLocal, engine
+
+
+def test_delete_task_removes_items_and_attachments_in_bulk(client, task):
+    task_id, items = task
+    for item in items[:3]:
+        response = client.post(f"/api/tasks/{task_id}/items/{item['id']}/upload",
+                               files={"file": ("证据.txt", b"evidence", "text/plain")})
+        assert response.status_code == 200
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        assert client.delete(f"/api/tasks/{task_id}").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    # 语句数与评估项数量无关（不逐个评估项加载附件）
+    assert not [s for s in statements if s.lstrip().startswith("SELECT") and "FROM attachments" in s]
+    assert len(statements) < 10
+    assert client.get(f"/api/tasks/{task_id}").status_code == 404
+
+    db = SessionLocal()
+    try:
+        for model in (Attachment, AssessmentItem):
+            assert db.scalar(select(func.count()).select_from(model).where(model.task_id == task_id)) == 0
+    finally:
+        db.close()
@@ -142,14 +142,26 @@ const app = createApp({
             return tpl ? tpl.description : '';
         });
 
+        // 增量同步缓存：任务 ID -> { version, items }，只拉取上次同步后变化的评估项
+        const itemSyncCache = {};
+
         // API/Storage 适配层
         const api = {
             async getTasks() {
                 if (USE_LOCAL_STORAGE) {
                     return StorageAPI.getAll(STORAGE_KEYS.tasks);
                 }
-                const res = await fetch(`${API_BASE}/tasks`);
-                return await res.json();
+                // 任务列表为游标分页，按 X-Next-Cursor 依次拉取全部页
+                const tasks = [];
+                let cursor = null;
+                do {
+                    const params = new URLSearchParams({ limit: 500 });
+                    if (cursor) params.set('cursor', cursor);
+                    const res = await fetch(`${API_BASE}/tasks?${params}`);
+                    tasks.push(...await res.json());
+                    cursor = res.headers.get('X-Next-Cursor');
+                } while (cursor);
+                return tasks;
             },
             async getTemplates() {
                 if (USE_LOCAL_STORAGE) {
@@ -208,8 +220,14 @@ const app = createApp({
                 if (USE_LOCAL_STORAGE) {
                     return StorageAPI.getAll(STORAGE_KEYS.taskItems + '_' + taskId);
                 }
-                const res = await fetch(`${API_BASE}/tasks/${taskId}/items`);
-                return await res.json();
+                const cache = itemSyncCache[taskId] || { version: 0, items: new Map() };
+                const res = await fetch(`${API_BASE}/tasks/${taskId}/sync?since=${cache.version}`);
+                const data = await res.json();
+                if (data.full) cache.items = new Map();
+                data.items.forEach(item => cache.items.set(item.id, item));
+                cache.version = data.version;
+                itemSyncCache[taskId] = cache;
+                return Array.from(cache.items.values(), item => ({ ...item }));
             },
             async updateTaskItem(taskId, itemId, updates) {
                 if (USE_LOCAL_STORAGE) {
@@ -230,6 +248,7 @@ const app = createApp({
                     return;
                 }
                 await fetch(`${API_BASE}/tasks/${taskId}`, { method: 'DELETE' });
+                delete itemSyncCache[taskId];
             },
             async getTaskResult(taskId) {
                 if (USE_LOCAL_STORAGE) {
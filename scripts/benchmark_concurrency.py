@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+数据库并发读写性能基准
+
+在临时 SQLite 数据库上用 N 个并发客户端（协程，与异步接口共用事件循环）同时更新评估项、读取任务详情和评估结果，
+对比默认配置（回滚日志、synchronous=FULL）与调优配置（WAL、synchronous=NORMAL 等）的吞吐量
+
+使用方法:
+    python3 benchmark_concurrency.py [--clients 1 4 16] [--duration 5] [--write-ratio 0.3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from fastapi import Request, Response
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine, create_async_db_engine, sqlite_pragmas_from_env
+from models import Base, AssessmentItem, StandardTemplate
+from templates import get_default_templates
+from main import create_task, update_item, get_task, get_task_result, AssessmentTaskCreate, AssessmentItemUpdate
+
+PROFILES = {
+    "default": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "tuned": sqlite_pragmas_from_env(),
+}
+
+RATINGS = ["compliant", "partial", "non_compliant", "not_applicable"]
+
+# 直接调用接口函数时使用的空请求（无条件请求头）
+EMPTY_REQUEST = Request({"type": "http", "method": "GET", "headers": []})
+
+
+def seed(Session, tasks: int):
+    """写入默认模板并创建若干等保三级任务，返回 [(任务 ID, [评估项 ID])]"""
+    db = Session()
+    try:
+        for tpl in get_default_templates():
+            db.add(StandardTemplate(**tpl))
+        db.commit()
+        seeded = []
+        for n in range(tasks):
+            task_id = create_task(AssessmentTaskCreate(name=f"bench {n}", template_id="djcp_data"), db)["id"]
+            item_ids = [i for (i,) in db.query(AssessmentItem.id).filter(AssessmentItem.task_id == task_id)]
+            seeded.append((task_id, item_ids))
+        return seeded
+    finally:
+        db.close()
+
+
+async def client(AsyncSession, seeded, write_ratio, deadline, stats):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        task_id, item_ids = rng.choice(seeded)
+        async with AsyncSession() as db:
+            try:
+                if rng.random() < write_ratio:
+                    await update_item(
+                        task_id, rng.choice(item_ids), AssessmentItemUpdate(rating=rng.choice(RATINGS)), db
+                    )
+                    stats["writes"] += 1
+                else:
+                    await get_task(task_id, EMPTY_REQUEST, db)
+                    await get_task_result(task_id, EMPTY_REQUEST, Response(), db)
+                    stats["reads"] += 1
+            except OperationalError:
+                await db.rollback()
+                stats["errors"] += 1
+
+
+async def run_clients(async_engine, seeded, clients, duration, write_ratio):
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    stats = {"reads": 0, "writes": 0, "errors": 0}
+    deadline = time.perf_counter() + duration
+    try:
+        await asyncio.gather(*[
+            client(AsyncSession, seeded, write_ratio, deadline, stats) for _ in range(clients)
+        ])
+    finally:
+        await async_engine.dispose()
+    return stats
+
+
+def run_profile(pragmas, clients, duration, write_ratio, tasks):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        pool_options = {"pool_size": clients, "max_overflow": 0}
+        engine = create_db_engine(f"sqlite:///{path}", sqlite_pragmas=pragmas, pool_options=pool_options)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        Base.metadata.create_all(bind=engine)
+        seeded = seed(Session, tasks)
+        engine.dispose()
+
+        async_engine = create_async_db_engine(
+            f"sqlite+aiosqlite:///{path}", sqlite_pragmas=pragmas, pool_options=pool_options
+        )
+        return asyncio.run(run_clients(async_engine, seeded, clients, duration, write_ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库并发读写性能基准")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="并发客户端数量")
+    parser.add_argument("--duration", type=float, default=5, help="每组测试时长（秒）")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="写操作比例")
+    parser.add_argument("--tasks", type=int, default=20, help="预置任务数量")
+    args = parser.parse_args()
+
+    print("📊 并发读写性能基准（临时 SQLite 数据库）")
+    print(f"   写操作比例 {args.write_ratio:.0%}，每组 {args.duration:g} 秒")
+    print()
+    print(f"{'配置':<8} | {'客户端':>6} | {'读 ops/s':>10} | {'写 ops/s':>10} | {'锁冲突':>6}")
+    print("-" * 52)
+    for clients in args.clients:
+        for name, pragmas in PROFILES.items():
+            stats = run_profile(pragmas, clients, args.duration, args.write_ratio, args.tasks)
+            print(f"{name:<8} | {clients:>6} | {stats['reads'] / args.duration:>10.1f} | "
+                  f"{stats['writes'] / args.duration:>10.1f} | {stats['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+评估任务创建性能基准
+
+在临时 SQLite 数据库中注册不同规模的自定义模板，测量 create_task 的耗时
+
+使用方法:
+    python3 benchmark_create_task.py [--sizes 50 500 5000] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, StandardTemplate
+from main import create_task, AssessmentTaskCreate
+
+
+def make_template(size: int):
+    """生成含 size 个评估项的模板"""
+    dimensions = [{"id": f"dim{d}", "name": f"维度 {d}", "weight": 0.1} for d in range(10)]
+    items = [
+        {
+            "id": f"bench-{i:05d}",
+            "dimension": f"dim{i % 10}",
+            "level": "三级",
+            "content": f"基准测试控制项 {i}：是否建立并落实相应的数据安全管理要求",
+            "max_score": 5,
+        }
+        for i in range(size)
+    ]
+    return StandardTemplate(
+        id=f"bench_{size}",
+        name=f"基准模板 ({size} 项)",
+        standard_no="BENCH",
+        version="1",
+        dimensions=dimensions,
+        items=items,
+    )
+
+
+def run(sizes, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+        db = Session()
+        for size in sizes:
+            db.add(make_template(size))
+        db.commit()
+        db.close()
+
+        print(f"{'评估项数':>8} | {'中位数 (ms)':>12} | {'最小 (ms)':>10} | {'最大 (ms)':>10}")
+        print("-" * 50)
+        for size in sizes:
+            timings = []
+            for n in range(repeat):
+                db = Session()
+                try:
+                    start = time.perf_counter()
+                    create_task(AssessmentTaskCreate(name=f"bench {size}-{n}", template_id=f"bench_{size}"), db)
+                    timings.append((time.perf_counter() - start) * 1000)
+                finally:
+                    db.close()
+            print(f"{size:>8} | {statistics.median(timings):>12.1f} | {min(timings):>10.1f} | {max(timings):>10.1f}")
+
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评估任务创建性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="模板评估项数量")
+    parser.add_argument("--repeat", type=int, default=5, help="每种规模重复次数")
+    args = parser.parse_args()
+
+    print("📊 create_task 性能基准（临时 SQLite 数据库）")
+    print()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+响应序列化与压缩基准
+
+在临时 SQLite 数据库中注册一个含 N 个评估项的模板，创建任务并填写全部评估项（含中文证据和备注），
+对任务详情（GET /api/tasks/{id}）的响应：
+- 对比 FastAPI 默认序列化（jsonable_encoder + 标准库 json）与 FastJSONResponse 的耗时
+- 经 CompressionMiddleware 实际传输的字节数（不压缩 / gzip / brotli）及压缩耗时
+
+使用方法:
+    python3 benchmark_json.py [--items 500] [--repeat 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from models import Base, AssessmentItem, StandardTemplate
+from main import create_task, get_task, update_items_batch, AssessmentTaskCreate, AssessmentItemBatchUpdate
+from responses import FastJSONResponse, CompressionMiddleware, available_encodings, orjson
+
+EMPTY_REQUEST = Request({"type": "http", "method": "GET", "headers": []})
+
+RATINGS = ["compliant", "partial", "non_compliant", "not_applicable"]
+
+
+def make_template(size: int):
+    """生成含 size 个评估项的模板（评估内容、检查方法为中文长文本）"""
+    dimensions = [{"id": f"dim{d}", "name": f"安全管理维度 {d}", "weight": 0.1} for d in range(10)]
+    items = [
+        {
+            "id": f"bench-{i:05d}",
+            "dimension": f"dim{i % 10}",
+            "level": "三级",
+            "control_point": f"数据安全管理制度 {i}",
+            "control_item": f"应建立数据分类分级管理制度，明确各类数据的安全保护要求，并定期评审和修订（控制项 {i}）",
+            "content": f"是否建立并落实相应的数据安全管理要求，覆盖数据收集、存储、使用、加工、传输、提供、公开等环节（{i}）",
+            "method": "查阅管理制度文件、访谈安全负责人、核查相关记录",
+            "max_score": 5,
+        }
+        for i in range(size)
+    ]
+    return StandardTemplate(
+        id=f"bench_{size}",
+        name=f"基准模板 ({size} 项)",
+        standard_no="BENCH",
+        version="1",
+        dimensions=dimensions,
+        items=items,
+    )
+
+
+def seed(Session, size: int):
+    """创建任务并为每个评估项评分、填写证据和备注，返回任务 ID"""
+    db = Session()
+    try:
+        db.add(make_template(size))
+        db.commit()
+        task_id = create_task(AssessmentTaskCreate(name="json bench", template_id=f"bench_{size}"), db)["id"]
+        item_ids = [i for (i,) in db.query(AssessmentItem.id).filter(AssessmentItem.task_id == task_id)]
+        entries = [
+            {
+                "item_id": item_id,
+                "rating": RATINGS[n % len(RATINGS)],
+                "evidence": f"已查阅《数据安全管理制度》第 {n + 1} 章及相关记录，现场访谈安全负责人，核对系统配置截图",
+                "remarks": "需在下一季度复核",
+            }
+            for n, item_id in enumerate(item_ids)
+        ]
+        update_items_batch(task_id, AssessmentItemBatchUpdate(items=entries), db)
+        return task_id
+    finally:
+        db.close()
+
+
+def median_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def wire_bytes(content, repeat: int):
+    """经 CompressionMiddleware 返回响应，返回 [(Accept-Encoding, Content-Encoding, 传输字节数, 耗时 ms)]"""
+    body = FastJSONResponse(content).body
+
+    async def endpoint(request):
+        return Response(body, media_type="application/json")
+
+    client = TestClient(CompressionMiddleware(Starlette(routes=[Route("/", endpoint)])))
+    results = []
+    for accept in ["identity"] + list(reversed(available_encodings())):
+        headers = {"Accept-Encoding": accept}
+        r = client.get("/", headers=headers)
+        elapsed = median_ms(lambda: client.get("/", headers=headers), repeat)
+        results.append((accept, r.headers.get("content-encoding", "-"), r.num_bytes_downloaded, elapsed))
+    return results
+
+
+async def fetch_task(url: str, task_id: int):
+    async_engine = create_async_engine(url)
+    try:
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+            return json.loads((await get_task(task_id, EMPTY_REQUEST, db)).body)
+    finally:
+        await async_engine.dispose()
+
+
+def run(size: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{path}")
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        Base.metadata.create_all(bind=engine)
+        task_id = seed(Session, size)
+        engine.dispose()
+        content = asyncio.run(fetch_task(f"sqlite+aiosqlite:///{path}", task_id))
+
+    print(f"   {size} 个评估项，orjson {'已安装' if orjson else '未安装（回退到标准库 json）'}")
+    print()
+
+    variants = [
+        ("FastAPI 默认（encoder + json）", lambda: JSONResponse(jsonable_encoder(content))),
+        ("encoder + FastJSONResponse", lambda: FastJSONResponse(jsonable_encoder(content))),
+        ("JSONResponse（json）", lambda: JSONResponse(content)),
+        ("FastJSONResponse", lambda: FastJSONResponse(content)),
+    ]
+    print(f"{'序列化（encoder 即 jsonable_encoder）':<34} | {'中位数 (ms)':>12} | {'加速':>6}")
+    print("-" * 60)
+    baseline = None
+    for name, fn in variants:
+        elapsed = median_ms(fn, repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<34} | {elapsed:>12.2f} | {baseline / elapsed:>5.1f}x")
+    print("   任务详情、增量同步接口直接返回 FastJSONResponse，其他接口为 encoder + FastJSONResponse")
+    print()
+
+    print(f"{'Accept-Encoding':<16} | {'编码':>6} | {'传输字节':>10} | {'较不压缩':>8} | {'请求耗时 (ms)':>14}")
+    print("-" * 66)
+    results = wire_bytes(content, repeat)
+    raw = results[0][2]
+    for accept, encoding, size_bytes, elapsed in results:
+        print(f"{accept:<16} | {encoding:>6} | {size_bytes:>10} | {1 - size_bytes / raw:>8.0%} | {elapsed:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化与压缩基准")
+    parser.add_argument("--items", type=int, default=500, help="模板评估项数量")
+    parser.add_argument("--repeat", type=int, default=50, help="每项测量重复次数")
+    args = parser.parse_args()
+
+    print("📦 响应序列化与压缩基准（临时 SQLite 数据库）")
+    run(args.items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+任务详情响应大小基准
+
+在临时 SQLite 数据库中创建一个模板的评估任务并填写全部评估项，
+对比 GET /api/tasks/{id} 在完整、compact、fields 投影和列数组模式下的响应字节数（原始 / gzip）
+
+使用方法:
+    python3 benchmark_payload.py [--template djcp_data] [--evidence-ratio 0.5]
+"""
+
+import argparse
+import asyncio
+import gzip
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from fastapi import Request
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, AssessmentItem, StandardTemplate
+from templates import get_default_templates
+from main import create_task, get_task, update_items_batch, AssessmentTaskCreate, AssessmentItemBatchUpdate
+
+EMPTY_REQUEST = Request({"type": "http", "method": "GET", "headers": []})
+
+RATINGS = ["compliant", "partial", "non_compliant", "not_applicable"]
+
+# (说明, fields, compact, layout)
+VARIANTS = [
+    ("完整", None, False, "rows"),
+    ("compact", None, True, "rows"),
+    ("compact + 列数组", None, True, "columns"),
+    ("fields=id,rating,score", "id,rating,score", False, "rows"),
+    ("fields=id,rating,score + 列数组", "id,rating,score", False, "columns"),
+]
+
+
+def seed(Session, template_id: str, evidence_ratio: float):
+    """创建任务并为每个评估项评分，按比例填写证据和备注，返回任务 ID"""
+    rng = random.Random(0)
+    db = Session()
+    try:
+        for tpl in get_default_templates():
+            db.add(StandardTemplate(**tpl))
+        db.commit()
+        task_id = create_task(AssessmentTaskCreate(name="payload bench", template_id=template_id), db)["id"]
+        item_ids = [i for (i,) in db.query(AssessmentItem.id).filter(AssessmentItem.task_id == task_id)]
+        entries = []
+        for n, item_id in enumerate(item_ids):
+            entry = {"item_id": item_id, "rating": rng.choice(RATINGS)}
+            if rng.random() < evidence_ratio:
+                entry["evidence"] = f"已查阅《数据安全管理制度》第 {n + 1} 章及相关记录，现场访谈安全负责人，核对系统配置截图"
+                entry["remarks"] = "需在下一季度复核"
+            entries.append(entry)
+        update_items_batch(task_id, AssessmentItemBatchUpdate(items=entries), db)
+        return task_id, len(item_ids)
+    finally:
+        db.close()
+
+
+async def fetch_bodies(url: str, task_id: int):
+    """按 VARIANTS 依次请求任务详情，返回响应体列表"""
+    async_engine = create_async_engine(url)
+    try:
+        async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+            return [
+                (await get_task(task_id, EMPTY_REQUEST, db, fields, compact, layout)).body
+                for _, fields, compact, layout in VARIANTS
+            ]
+    finally:
+        await async_engine.dispose()
+
+
+def run(template_id: str, evidence_ratio: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        engine = create_engine(f"sqlite:///{path}")
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        Base.metadata.create_all(bind=engine)
+        task_id, item_count = seed(Session, template_id, evidence_ratio)
+        engine.dispose()
+        bodies = asyncio.run(fetch_bodies(f"sqlite+aiosqlite:///{path}", task_id))
+        print(f"   模板 {template_id}，{item_count} 个评估项，{evidence_ratio:.0%} 填写证据")
+        print()
+
+        print(f"{'模式':<32} | {'字节':>8} | {'较完整':>7} | {'gzip':>7} | {'较完整':>7}")
+        print("-" * 75)
+        baseline = None
+        for (name, _, _, _), body in zip(VARIANTS, bodies):
+            zipped = len(gzip.compress(body))
+            if baseline is None:
+                baseline = (len(body), zipped)
+            print(
+                f"{name:<32} | {len(body):>8} | {1 - len(body) / baseline[0]:>7.0%} | "
+                f"{zipped:>7} | {1 - zipped / baseline[1]:>7.0%}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务详情响应大小基准")
+    parser.add_argument("--template", default="djcp_data", help="模板 ID")
+    parser.add_argument("--evidence-ratio", type=float, default=0.5, help="填写证据的评估项比例")
+    args = parser.parse_args()
+
+    print("📦 任务详情响应大小基准（临时 SQLite 数据库）")
+    run(args.template, args.evidence_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+API 压测与基准套件
+
+在临时 SQLite 数据库上启动 uvicorn（单进程），通过 HTTP 按内置模板轮流预置 N 个任务（随机填写评分），
+然后逐个接口、逐个并发级别压测，统计吞吐量和延迟分位数；结果可写入 JSON 文件，
+并与之前保存的结果（如另一个提交的运行结果）对比，吞吐量下降或 p99 上升超过阈值时以非零状态退出
+
+接口:
+    create_task      POST /api/tasks
+    update_item      PUT  /api/tasks/{id}/items/{item_id}
+    get_task         GET  /api/tasks/{id}
+    get_task_result  GET  /api/tasks/{id}/result
+    list_tasks       GET  /api/tasks
+    list_templates   GET  /api/templates
+
+--backend-dir 可指定其他版本的 backend 目录（如 git worktree 检出的旧提交）；
+--base-url 可直接压测已运行的服务（不启动 uvicorn）
+
+使用方法（需要 httpx）:
+    python3 loadtest.py [--clients 10 50] [--duration 5] [--tasks 20] [--endpoints get_task update_item]
+    python3 loadtest.py --output base.json
+    python3 loadtest.py --compare base.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+RATINGS = ["compliant", "partial", "non_compliant", "not_applicable"]
+
+
+# ============ 接口请求 ============
+
+async def create_task(client, rng, seeded, templates):
+    return await client.post("/api/tasks", json={"name": "压测任务", "template_id": rng.choice(templates)})
+
+
+async def update_item(client, rng, seeded, templates):
+    task_id, item_ids = rng.choice(seeded)
+    return await client.put(
+        f"/api/tasks/{task_id}/items/{rng.choice(item_ids)}", json={"rating": rng.choice(RATINGS)}
+    )
+
+
+async def get_task(client, rng, seeded, templates):
+    return await client.get(f"/api/tasks/{rng.choice(seeded)[0]}")
+
+
+async def get_task_result(client, rng, seeded, templates):
+    return await client.get(f"/api/tasks/{rng.choice(seeded)[0]}/result")
+
+
+async def list_tasks(client, rng, seeded, templates):
+    return await client.get("/api/tasks", params={"limit": 50})
+
+
+async def list_templates(client, rng, seeded, templates):
+    return await client.get("/api/templates")
+
+
+ENDPOINTS = {
+    "create_task": create_task,
+    "update_item": update_item,
+    "get_task": get_task,
+    "get_task_result": get_task_result,
+    "list_tasks": list_tasks,
+    "list_templates": list_templates,
+}
+
+
+# ============ 服务与数据 ============
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(backend_dir: str, data_dir: str, port: int):
+    """在临时数据目录上启动 uvicorn，返回进程"""
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(data_dir, 'loadtest.db')}",
+        UPLOAD_DIR=os.path.join(data_dir, "uploads"),
+        JOB_OUTPUT_DIR=os.path.join(data_dir, "jobs"),
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir, env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+async def seed(base_url: str, tasks: int, seed_value: int):
+    """按内置模板轮流创建任务并随机填写评分，返回 ([(任务 ID, [评估项 ID])], [模板 ID])"""
+    rng = random.Random(seed_value)
+    seeded = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        templates = [t["id"] for t in (await client.get("/api/templates")).json()]
+        if not templates:
+            raise RuntimeError("服务中没有可用的模板")
+        for n in range(tasks):
+            template_id = templates[n % len(templates)]
+            r = await client.post("/api/tasks", json={
+                "name": f"压测任务 {n}", "template_id": template_id, "organization": f"压测组织 {n % 5}"
+            })
+            r.raise_for_status()
+            task_id = r.json()["id"]
+            item_ids = [i["id"] for i in (await client.get(f"/api/tasks/{task_id}")).json()["items"]]
+            entries = [{"item_id": i, "rating": rng.choice(RATINGS)} for i in item_ids if rng.random() < 0.7]
+            if entries:
+                (await client.put(f"/api/tasks/{task_id}/items", json={"items": entries})).raise_for_status()
+            seeded.append((task_id, item_ids))
+    return seeded, templates
+
+
+# ============ 压测与统计 ============
+
+async def client_loop(client, request, seeded, templates, deadline, record):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            r = await request(client, rng, seeded, templates)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        record(ok, (time.perf_counter() - start) * 1000)
+
+
+async def run_level(base_url, name, clients, duration, warmup, seeded, templates):
+    """对一个接口以 clients 个并发客户端压测 duration 秒（前 warmup 秒不计入），返回统计结果"""
+    latencies, errors = [], 0
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def record(ok, elapsed_ms):
+        nonlocal errors
+        if time.perf_counter() - elapsed_ms / 1000 < measure_from:
+            return
+        if ok:
+            latencies.append(elapsed_ms)
+        else:
+            errors += 1
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*[
+            client_loop(client, ENDPOINTS[name], seeded, templates, deadline, record) for _ in range(clients)
+        ])
+    return summarize(name, clients, duration, latencies, errors)
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def summarize(name, clients, duration, latencies, errors):
+    values = sorted(latencies)
+    return {
+        "endpoint": name,
+        "clients": clients,
+        "requests": len(values),
+        "errors": errors,
+        "rps": round(len(values) / duration, 1),
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 2),
+        "p90_ms": round(percentile(values, 0.90), 2),
+        "p99_ms": round(percentile(values, 0.99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def git_revision(path: str):
+    """返回 (提交, 工作区是否有未提交修改)，不在 git 仓库中时返回 (None, None)"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=path,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=path,
+                               capture_output=True, text=True, check=True).stdout.strip() != ""
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+# ============ 输出 ============
+
+def print_header():
+    print(f"{'接口':<16} | {'客户端':>6} | {'请求/秒':>8} | {'p50 ms':>8} | {'p90 ms':>8} | {'p99 ms':>8} | {'错误':>5}")
+    print("-" * 78)
+
+
+def print_row(r):
+    print(f"{r['endpoint']:<16} | {r['clients']:>6} | {r['rps']:>8.1f} | {r['p50_ms']:>8.1f} | "
+          f"{r['p90_ms']:>8.1f} | {r['p99_ms']:>8.1f} | {r['errors']:>5}")
+
+
+def compare(results, baseline: dict, threshold: float) -> list:
+    """与基准结果对比，打印变化并返回超过阈值的退化项"""
+    previous = {(r["endpoint"], r["clients"]): r for r in baseline["results"]}
+    print()
+    print(f"🔄 对比基准 {baseline['meta'].get('commit') or '-'}（{baseline['meta'].get('timestamp', '')}）")
+    print(f"{'接口':<16} | {'客户端':>6} | {'请求/秒':>18} | {'p99 ms':>20}")
+    print("-" * 70)
+    regressions = []
+    for r in results:
+        old = previous.get((r["endpoint"], r["clients"]))
+        if old is None:
+            continue
+        rps_change = r["rps"] / old["rps"] - 1 if old["rps"] else 0.0
+        p99_change = r["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        flag = ""
+        if rps_change < -threshold or p99_change > threshold:
+            regressions.append((r["endpoint"], r["clients"], rps_change, p99_change))
+            flag = " ⚠️"
+        print(f"{r['endpoint']:<16} | {r['clients']:>6} | {old['rps']:>7.1f} -> {r['rps']:>7.1f} | "
+              f"{old['p99_ms']:>8.1f} -> {r['p99_ms']:>8.1f}{flag}")
+    return regressions
+
+
+async def run(args, base_url: str):
+    await wait_ready(base_url)
+    seeded, templates = await seed(base_url, args.tasks, args.seed)
+    print(f"   {len(seeded)} 个任务（模板 {', '.join(templates)}），每组 {args.duration:g} 秒（预热 {args.warmup:g} 秒）")
+    print()
+    print_header()
+    results = []
+    for name in args.endpoints:
+        for clients in args.clients:
+            result = await run_level(base_url, name, clients, args.duration, args.warmup, seeded, templates)
+            print_row(result)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API 压测与基准套件")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS), help="压测的接口")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 50], help="并发客户端数量")
+    parser.add_argument("--duration", type=float, default=5, help="每组计时时长（秒）")
+    parser.add_argument("--warmup", type=float, default=1, help="每组预热时长（秒），不计入结果")
+    parser.add_argument("--tasks", type=int, default=20, help="预置任务数量")
+    parser.add_argument("--seed", type=int, default=0, help="预置数据的随机种子")
+    parser.add_argument("--backend-dir", default=BACKEND_DIR, help="启动服务的 backend 目录")
+    parser.add_argument("--base-url", help="压测已运行的服务（不启动 uvicorn）")
+    parser.add_argument("--output", help="结果写入 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="吞吐量下降或 p99 上升超过该比例时视为退化")
+    args = parser.parse_args()
+
+    backend_dir = os.path.abspath(args.backend_dir)
+    commit, dirty = git_revision(backend_dir)
+    print(f"📊 API 压测（{commit or '未知提交'}{'，有未提交修改' if dirty else ''}）")
+
+    if args.base_url:
+        results = asyncio.run(run(args, args.base_url))
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            port = free_port()
+            server = start_server(backend_dir, data_dir, port)
+            try:
+                results = asyncio.run(run(args, f"http://127.0.0.1:{port}"))
+            finally:
+                server.terminate()
+                server.wait()
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "dirty": dirty,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "base_url": args.base_url,
+            "tasks": args.tasks,
+            "duration": args.duration,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} 项性能退化超过 {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ 未发现超过阈值的性能退化")
+
+
+if __name__ == "__main__":
+    main()